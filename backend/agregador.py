@@ -0,0 +1,175 @@
+"""
+Agregador de estadísticas: consume los streams de predicciones y métricas.
+
+Lee stream:predicciones y stream:metricas con el grupo de consumidores
+"agregadores", aplica cada lote a los agregados y lo confirma con XACK en
+el mismo MULTI/EXEC (ver estadisticas.procesar_entradas). Se pueden correr
+varias réplicas: cada entrada la recibe un solo consumidor del grupo.
+
+Si una réplica muere con entradas leídas y sin confirmar, otra las reclama
+(XAUTOCLAIM) cuando llevan más de --reclamar-ms sin confirmarse.
+
+Las entradas que no se pueden agregar (registro corrupto, valores no
+finitos) se confirman y se copian a stream:descartadas para revisarlas.
+
+Cada --recortar-ms recorta los streams a unas PREDICCIONES_LOG_MAX y
+METRICAS_LOG_MAX entradas (0 = sin límite), borrando solo entradas ya
+confirmadas (ver estadisticas.recortar_stream).
+
+Uso desde la terminal:
+    python agregador.py --lote 500 --bloqueo-ms 5000
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+import estadisticas
+
+logger = logging.getLogger(__name__)
+
+CANDADO_INICIO_KEY = "agregador:inicializando"
+
+
+def inicializar(r, espera=1.0):
+    """
+    Incorpora las listas anteriores a los agregados antes de consumir. Solo
+    una réplica lo hace (candado con SET NX); las demás esperan la marca.
+    """
+    while not estadisticas.agregados_inicializados(r):
+        if r.set(CANDADO_INICIO_KEY, socket.gethostname(), nx=True, ex=600):
+            try:
+                logger.info("Incorporando las listas anteriores a los agregados")
+                estadisticas.inicializar_agregados(r)
+            finally:
+                r.delete(CANDADO_INICIO_KEY)
+        else:
+            time.sleep(espera)
+
+
+class Agregador:
+    def __init__(self, r, consumidor, lote=500, bloqueo_ms=5000, reclamar_ms=60000,
+                 limites=None, recortar_ms=10000):
+        self.r = r
+        self.consumidor = consumidor
+        self.lote = lote
+        self.bloqueo_ms = bloqueo_ms
+        self.reclamar_ms = reclamar_ms
+        # stream -> entradas que se conservan (None = sin límite)
+        self.limites = limites or {}
+        self.recortar_ms = recortar_ms
+        self.procesadas = 0
+        self._detener = threading.Event()
+
+    def detener(self, *_):
+        self._detener.set()
+
+    def reclamar(self):
+        """
+        Procesa las entradas pendientes de consumidores caídos.
+        """
+        for stream in estadisticas.LOGS:
+            inicio = "0-0"
+            while True:
+                siguiente, entradas, *_ = self.r.xautoclaim(
+                    stream, estadisticas.GRUPO_AGREGADORES, self.consumidor,
+                    self.reclamar_ms, start_id=inicio, count=self.lote,
+                )
+                if entradas:
+                    logger.info("Reclamadas %d entradas de %s", len(entradas), stream)
+                    self._procesar(stream, entradas)
+                if siguiente == "0-0":
+                    break
+                inicio = siguiente
+
+    def recortar(self):
+        for stream, max_log in self.limites.items():
+            borradas = estadisticas.recortar_stream(self.r, stream, max_log)
+            if borradas:
+                logger.info("Recortadas %d entradas confirmadas de %s", borradas, stream)
+
+    def _procesar(self, stream, entradas):
+        # XAUTOCLAIM devuelve (id, None) para entradas ya recortadas del stream
+        entradas = [(i, campos or {}) for i, campos in entradas]
+        estadisticas.procesar_entradas(self.r, stream, entradas)
+        self.procesadas += len(entradas)
+
+    def paso(self):
+        """
+        Lee y procesa un lote de cada stream. Devuelve cuántas entradas leyó.
+        """
+        respuesta = self.r.xreadgroup(
+            estadisticas.GRUPO_AGREGADORES,
+            self.consumidor,
+            {stream: ">" for stream in estadisticas.LOGS},
+            count=self.lote,
+            block=self.bloqueo_ms,
+        )
+        leidas = 0
+        for stream, entradas in respuesta or []:
+            if entradas:
+                self._procesar(stream, entradas)
+                leidas += len(entradas)
+        return leidas
+
+    def correr(self):
+        estadisticas.crear_grupos(self.r)
+        inicializar(self.r)
+        self.reclamar()
+        ultimo_reclamo = ultimo_recorte = time.monotonic()
+        logger.info("Agregador %s consumiendo", self.consumidor)
+
+        while not self._detener.is_set():
+            try:
+                self.paso()
+                if time.monotonic() - ultimo_reclamo > self.reclamar_ms / 1000:
+                    self.reclamar()
+                    ultimo_reclamo = time.monotonic()
+                if time.monotonic() - ultimo_recorte > self.recortar_ms / 1000:
+                    self.recortar()
+                    ultimo_recorte = time.monotonic()
+            except Exception as e:
+                # Lo no confirmado se vuelve a leer (o lo reclama otra réplica)
+                logger.error("Error al agregar: %s", e)
+                self._detener.wait(1.0)
+
+        logger.info("Agregador %s detenido (%d entradas)", self.consumidor, self.procesadas)
+
+
+def main(argv=None):
+    import redis
+
+    parser = argparse.ArgumentParser(description="Agrega los streams de predicciones y métricas.")
+    parser.add_argument("--consumidor", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--lote", type=int, default=500)
+    parser.add_argument("--bloqueo-ms", type=int, default=5000)
+    parser.add_argument("--reclamar-ms", type=int, default=60000,
+                        help="Tiempo sin confirmar tras el cual se reclama una entrada")
+    parser.add_argument("--recortar-ms", type=int, default=10000,
+                        help="Cada cuánto se recortan las entradas ya confirmadas")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    r = redis.Redis(
+        host=os.environ.get("REDIS_HOST", "redis"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=True,
+    )
+    limites = {
+        estadisticas.PREDICCIONES_STREAM:
+            estadisticas.leer_limite_log("PREDICCIONES_LOG_MAX", "100000"),
+        estadisticas.METRICAS_STREAM: estadisticas.leer_limite_log("METRICAS_LOG_MAX", "10000"),
+    }
+    agregador = Agregador(r, args.consumidor, args.lote, args.bloqueo_ms, args.reclamar_ms,
+                          limites, args.recortar_ms)
+    signal.signal(signal.SIGTERM, agregador.detener)
+    signal.signal(signal.SIGINT, agregador.detener)
+    agregador.correr()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,42 @@
-from flask import Flask, request, jsonify
+import time
+
+# Momento de arranque del proceso, para medir el arranque en frío
+ARRANQUE = time.time()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
+import atexit
 import os
-import pandas as pd
-import subprocess
 import redis
-from datetime import datetime
+import shutil
+import tempfile
+from datetime import datetime, timezone
 import json
-import time
 import uuid
 import hashlib
 import secrets
+import signal
+import sys
 from auth import auth_bp  # Importamos el blueprint de auth.py
+from cache_predicciones import CachePredicciones
+import cohortes
+import foro
+from estadisticas import (
+    GRANULARIDADES,
+    contar_cubetas,
+    guardar_evento_metrica,
+    guardar_predicciones,
+    resumen_metricas,
+    resumen_predicciones,
+    resumen_rango,
+)
+from inferencia import VALORES_BARRIDO, parsear_datos
+from likes_diferidos import AcumuladorLikes
+from microlotes import ProgramadorMicrolotes
+from puntuar_csv import FORMATOS as FORMATOS_CSV, TAM_BLOQUE as TAM_BLOQUE_CSV
+from puntuar_csv import linea_error, puntuar_bloques, serializar
+from registro_modelos import MODELO_ACTIVO_KEY, MODELO_ANTERIOR_KEY, RegistroModelos
+from registros import mensaje_riesgo
 
 app = Flask(__name__)
 
@@ -71,15 +96,86 @@ seed_admin()
 
 # ---------- CARGA / ENTRENAMIENTO DEL MODELO ----------
 
-def cargar_modelo():
-    modelo_path = "proyecto_curso.pkl"
-    if not os.path.exists(modelo_path):
-        print("Modelo no encontrado. Entrenando modelo...")
-        subprocess.run(["python", "proyecto_curso.py"], check=True)
-    return joblib.load(modelo_path)
+MODELO_INICIAL_PATH = "proyecto_curso.pkl"
+# Artefacto compacto del modelo inicial (python artefacto.py proyecto_curso.pkl);
+# si existe, el arranque no necesita scikit-learn.
+MODELO_COMPACTO_PATH = "proyecto_curso.lrbin"
 
 
-model = cargar_modelo()
+def entrenar_modelo():
+    """
+    Genera MODELO_INICIAL_PATH. Se ejecuta en el hilo de arranque del
+    registro, nunca en el camino de una petición.
+    """
+    # Import diferido: scikit-learn solo se carga si hay que entrenar
+    import entrenamiento
+
+    print("Modelo no encontrado. Entrenando modelo en segundo plano...")
+    model, reporte = entrenamiento.entrenar()
+    entrenamiento.guardar(model, reporte, MODELO_INICIAL_PATH)
+    print(f"✅ Modelo entrenado en {reporte['segundos_total']:.1f} s "
+          f"(accuracy {reporte['metricas_prueba']['accuracy']:.3f})")
+
+
+# ---------- REGISTRO DE VERSIONES DEL MODELO ----------
+# La versión activa vive en Redis; cada worker la vigila y recarga en caliente.
+
+registro_modelos = RegistroModelos(
+    r,
+    directorio=os.environ.get("MODELOS_DIR", "modelos"),
+    intervalo=float(os.environ.get("MODELO_POLL_SEG", "5")),
+)
+# La carga (o el entrenamiento) corre en segundo plano: la app atiende desde
+# el primer momento y /api/predict responde 503 hasta que haya modelo.
+registro_modelos.inicializar_en_segundo_plano(
+    MODELO_COMPACTO_PATH if os.path.exists(MODELO_COMPACTO_PATH) else MODELO_INICIAL_PATH,
+    entrenar_modelo,
+)
+atexit.register(registro_modelos.detener)
+
+
+def modelo_no_disponible():
+    """
+    Respuesta 503 mientras el modelo se carga o se entrena.
+    """
+    return jsonify({
+        "error": "El modelo todavía no está disponible",
+        "entrenando": registro_modelos.entrenando,
+    }), 503
+
+
+# ---------- MICRO-LOTES (opcional) ----------
+# Se activa con PREDICT_MICROLOTES=1. Las peticiones concurrentes a
+# /api/predict se evalúan juntas en una sola matriz.
+
+def crear_programador():
+    if os.environ.get("PREDICT_MICROLOTES", "0") != "1":
+        return None
+    programador = ProgramadorMicrolotes(
+        lambda matriz, motor: motor.predecir_lote(matriz),
+        tam_lote=int(os.environ.get("PREDICT_LOTE_TAM", "32")),
+        espera_max_ms=float(os.environ.get("PREDICT_LOTE_ESPERA_MS", "2")),
+        max_cola=int(os.environ.get("PREDICT_LOTE_COLA", "1024")),
+    )
+    atexit.register(programador.detener)
+    return programador
+
+
+programador = crear_programador()
+
+
+# ---------- CACHÉ DE PREDICCIONES ----------
+# LRU en memoria + nivel compartido en Redis. Se desactiva con PREDICT_CACHE=0.
+
+cache = (
+    CachePredicciones(
+        r,
+        tam_max=int(os.environ.get("PREDICT_CACHE_TAM", "4096")),
+        ttl=int(os.environ.get("PREDICT_CACHE_TTL", "3600")),
+    )
+    if os.environ.get("PREDICT_CACHE", "1") == "1"
+    else None
+)
 
 
 # ---------- ENDPOINTS BÁSICOS ----------
@@ -89,346 +185,446 @@ def health():
     return jsonify({"status": "ok"})
 
 
+@app.get("/api/ready")
+def ready():
+    """
+    Lista para predecir solo cuando hay un modelo cargado. Incluye los
+    tiempos de arranque en frío medidos desde el inicio del proceso.
+    """
+    tiempos = {"app_import_seconds": APP_LISTA - ARRANQUE}
+    if registro_modelos.listo_en is not None:
+        tiempos["cold_start_seconds"] = registro_modelos.listo_en - ARRANQUE
+
+    if not registro_modelos.listo:
+        return jsonify({
+            "status": "starting",
+            "entrenando": registro_modelos.entrenando,
+            "error": registro_modelos.error_arranque,
+            **tiempos,
+        }), 503
+
+    return jsonify({
+        "status": "ready",
+        "model_version": registro_modelos.actual.version,
+        **tiempos,
+    })
+
+
 # ---------- PREDICCIÓN Y ALMACENAMIENTO EN REDIS ----------
 
+# Máximo de estudiantes por petición a /api/predict/batch
+MAX_LOTE_PREDICCION = 10000
+
+# Máximo de puntos de la malla en /api/predict/whatif
+MAX_PUNTOS_BARRIDO = 5000
+
+
+def construir_registro(valores, prediccion: int, probabilidad: float, message: str,
+                       model_version: str):
+    """
+    Registro que se guarda en el stream de predicciones de Redis.
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        **valores,
+        "prediction": prediccion,
+        "probability": probabilidad,
+        "message": message,
+        "model_version": model_version,
+    }
+
+
 @app.post("/api/predict")
 def api_predict():
+    """
+    Predicción para un estudiante. Con ?explicar=1 (y opcionalmente ?k=N)
+    la respuesta incluye las N contribuciones principales al riesgo.
+    """
     data = request.get_json(force=True)
+    explicar = request.args.get("explicar", "0") in ("1", "true")
 
     try:
-        age = int(data["age"])
-        gender = data["gender"]
-        academic_pressure = float(data["academic_pressure"])
-        cgpa = float(data["cgpa"])
-        study_hours = float(data["study_hours"])
-        study_satisfaction = float(data["study_satisfaction"])
-        financial_stress = float(data["financial_stress"])
-        family_history = data["family_history"]
-        suicidal_thoughts = data["suicidal_thoughts"]
-        sleep_duration = data["sleep_duration"]
-        dietary_habits = data["dietary_habits"]
-        works = data["works"]
-        work_pressure = float(data.get("work_pressure", 0.0)) if works == "Yes" else 0.0
+        valores = parsear_datos(data)
     except (KeyError, ValueError, TypeError) as e:
         return jsonify({"error": f"Datos inválidos: {e}"}), 400
 
-    columnas_modelo = model.feature_names_in_
-    nuevo_estudiante = pd.DataFrame(columns=columnas_modelo)
-    nuevo_estudiante.loc[0] = 0
-
-    nuevo_estudiante.loc[0, "Age"] = age
-    nuevo_estudiante.loc[0, "Gender_Male"] = 1 if gender == "Male" else 0
-    nuevo_estudiante.loc[0, "Academic Pressure"] = academic_pressure
-    nuevo_estudiante.loc[0, "CGPA"] = cgpa
-    nuevo_estudiante.loc[0, "Work/Study Hours"] = study_hours
-    nuevo_estudiante.loc[0, "Study Satisfaction"] = study_satisfaction
-    nuevo_estudiante.loc[0, "Financial Stress"] = financial_stress
-    nuevo_estudiante.loc[0, "Family History of Mental Illness_Yes"] = (
-        1 if family_history == "Yes" else 0
-    )
-    nuevo_estudiante.loc[0, "Have you ever had suicidal thoughts ?_Yes"] = (
-        1 if suicidal_thoughts == "Yes" else 0
-    )
+    # Toda la petición usa la misma versión del modelo
+    estado = registro_modelos.actual
+    if estado is None:
+        return modelo_no_disponible()
 
-    sleep_duration_columns = [
-        "Sleep Duration_7-8 hours",
-        "Sleep Duration_Less than 5 hours",
-        "Sleep Duration_More than 8 hours",
-    ]
-    for col in sleep_duration_columns:
-        if col.endswith(sleep_duration):
-            nuevo_estudiante.loc[0, col] = 1
-
-    dietary_habits_columns = [
-        "Dietary Habits_Others",
-        "Dietary Habits_Moderate",
-        "Dietary Habits_Unhealthy",
-    ]
-    for col in dietary_habits_columns:
-        if col.endswith(dietary_habits):
-            nuevo_estudiante.loc[0, col] = 1
-
-    nuevo_estudiante.loc[0, "Work Pressure"] = work_pressure
-    nuevo_estudiante.loc[0, "Profession_Student"] = 1
-
-    extra_cols = [c for c in nuevo_estudiante.columns if c not in columnas_modelo]
-    if extra_cols:
-        nuevo_estudiante.drop(columns=extra_cols, inplace=True)
-
-    for col in columnas_modelo:
-        if col not in nuevo_estudiante.columns:
-            nuevo_estudiante[col] = 0
-
-    prediccion = model.predict(nuevo_estudiante)
-    probabilidad = float(model.predict_proba(nuevo_estudiante)[0][1])
-
-    if prediccion[0] == 1:
-        message = f"Alto riesgo de depresión (Probabilidad: {probabilidad:.2f})"
+    indices, activos = estado.codificador.activos(valores)
+    explicacion = None
+
+    if explicar:
+        try:
+            k = int(request.args.get("k", 5))
+        except ValueError:
+            return jsonify({"error": "k debe ser un entero"}), 400
+        # Puntaje y contribuciones salen de la misma pasada
+        prediccion, probabilidad, explicacion = estado.motor.explicar_activos(
+            indices, activos, k
+        )
+        resultado = (prediccion, probabilidad)
     else:
-        message = f"Bajo riesgo de depresión (Probabilidad: {probabilidad:.2f})"
+        clave = cache.clave(indices, activos) if cache is not None else None
+        resultado = cache.obtener(estado.version, clave) if cache is not None else None
+
+    if resultado is None:
+        if programador is not None:
+            resultado = programador.predecir(
+                estado.codificador.codificar(valores), estado.motor
+            )
+        else:
+            resultado = estado.motor.predecir_activos(indices, activos)
+        if cache is not None:
+            cache.guardar(estado.version, clave, resultado)
+
+    prediccion, probabilidad = resultado
+
+    message = mensaje_riesgo(prediccion, probabilidad)
 
     # Guardar en Redis
-    registro = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "age": age,
-        "gender": gender,
-        "academic_pressure": academic_pressure,
-        "cgpa": cgpa,
-        "study_hours": study_hours,
-        "study_satisfaction": study_satisfaction,
-        "financial_stress": financial_stress,
-        "family_history": family_history,
-        "suicidal_thoughts": suicidal_thoughts,
-        "sleep_duration": sleep_duration,
-        "dietary_habits": dietary_habits,
-        "works": works,
-        "work_pressure": work_pressure,
-        "prediction": int(prediccion[0]),
+    registro = construir_registro(
+        valores, prediccion, probabilidad, message, estado.version
+    )
+
+    guardar_predicciones(r, [registro])
+
+    respuesta = {
+        "prediction": prediccion,
         "probability": probabilidad,
         "message": message,
     }
+    if explicacion is not None:
+        respuesta["explicacion"] = explicacion
 
-    r.rpush("predictions", json.dumps(registro))
+    return jsonify(respuesta)
 
-    return jsonify(
-        {
-            "prediction": int(prediccion[0]),
-            "probability": probabilidad,
-            "message": message,
-        }
-    )
 
+@app.post("/api/predict/batch")
+def api_predict_batch():
+    """
+    Predicción de un lote de estudiantes en una sola llamada al modelo.
+    Espera un arreglo JSON con objetos del mismo formato que /api/predict.
+    Devuelve los resultados en el mismo orden; las filas inválidas traen
+    un campo "error" en lugar de la predicción.
+    """
+    data = request.get_json(force=True)
 
-@app.get("/api/stats")
-def api_stats():
-    # ----------- PREDICCIONES (ya existente) -----------
-    items = r.lrange("predictions", 0, -1)
-    if not items:
-        return jsonify({"total_registros": 0})
+    if not isinstance(data, list):
+        return jsonify({"error": "Se esperaba un arreglo de estudiantes"}), 400
 
-    registros = [json.loads(x) for x in items]
-    total = len(registros)
+    estado = registro_modelos.actual
+    if estado is None:
+        return modelo_no_disponible()
+    if len(data) > MAX_LOTE_PREDICCION:
+        return jsonify({
+            "error": f"El lote excede el límite de {MAX_LOTE_PREDICCION} estudiantes"
+        }), 400
 
-    def pct(n):
-        return (n / total) * 100 if total else 0.0
+    resultados = [None] * len(data)
+    validos = []  # (posición en la entrada, valores parseados)
+    for i, item in enumerate(data):
+        try:
+            validos.append((i, parsear_datos(item)))
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            resultados[i] = {"index": i, "error": f"Datos inválidos: {e}"}
+
+    if validos:
+        matriz = estado.codificador.codificar_lote([valores for _, valores in validos])
+        predicciones, probabilidades = estado.motor.predecir_lote(matriz)
+
+        registros = []
+        for (i, valores), prediccion, probabilidad in zip(
+            validos, predicciones, probabilidades
+        ):
+            prediccion = int(prediccion)
+            probabilidad = float(probabilidad)
+            message = mensaje_riesgo(prediccion, probabilidad)
+            registros.append(construir_registro(
+                valores, prediccion, probabilidad, message, estado.version
+            ))
+            resultados[i] = {
+                "index": i,
+                "prediction": prediccion,
+                "probability": probabilidad,
+                "message": message,
+            }
 
-    # Distribución de género
-    gender_counts = {"Male": 0, "Female": 0, "Other": 0}
-    for reg in registros:
-        g = reg.get("gender", "Other")
-        if g not in gender_counts:
-            g = "Other"
-        gender_counts[g] += 1
+        # Un solo pipeline con el XADD de cada registro del lote; los agregados
+        # los actualiza el agregador al consumir el stream
+        guardar_predicciones(r, registros)
 
-    gender_distribution = {
-        k: {"count": v, "pct": pct(v)} for k, v in gender_counts.items()
-    }
+    return jsonify({
+        "resultados": resultados,
+        "total": len(data),
+        "validos": len(validos),
+        "invalidos": len(data) - len(validos),
+    })
 
-    # Riesgo alto / bajo
-    high = sum(1 for reg in registros if reg.get("prediction") == 1)
-    low = total - high
-    risk_distribution = {
-        "high": {"count": high, "pct": pct(high)},
-        "low": {"count": low, "pct": pct(low)},
-    }
 
-    # Variables binarias
-    fam_yes = sum(1 for reg in registros if reg.get("family_history") == "Yes")
-    sui_yes = sum(1 for reg in registros if reg.get("suicidal_thoughts") == "Yes")
-
-    # Distribución de sueño
-    sleep_opts = [
-        "7-8 hours",
-        "Less than 5 hours",
-        "More than 8 hours",
-    ]
-    sleep_counts = {k: 0 for k in sleep_opts}
-    for reg in registros:
-        s = reg.get("sleep_duration")
-        if s in sleep_counts:
-            sleep_counts[s] += 1
-    sleep_distribution = {
-        k: {"count": v, "pct": pct(v)} for k, v in sleep_counts.items()
-    }
+@app.post("/api/predict/whatif")
+def api_predict_whatif():
+    """
+    Barrido "qué pasaría si": riesgo del estudiante sobre una malla de valores.
+    Espera JSON con:
+      - estudiante: objeto con el formato de /api/predict
+      - variables: lista de campos a barrer (usa los valores por defecto) u
+        objeto {campo: [valores]}
+    Toda la malla se evalúa en una sola llamada al modelo y no se guarda.
+    """
+    data = request.get_json(force=True) or {}
 
-    # Distribución de hábitos alimenticios
-    diet_opts = ["Moderate", "Others", "Unhealthy"]
-    diet_counts = {k: 0 for k in diet_opts}
-    for reg in registros:
-        d = reg.get("dietary_habits")
-        if d in diet_counts:
-            diet_counts[d] += 1
-    dietary_distribution = {
-        k: {"count": v, "pct": pct(v)} for k, v in diet_counts.items()
-    }
+    try:
+        valores = parsear_datos(data["estudiante"])
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"error": f"Datos inválidos: {e}"}), 400
 
-    # Promedios
-    def avg(field):
-        vals = [
-            float(reg.get(field))
-            for reg in registros
-            if reg.get(field) is not None
-        ]
-        return sum(vals) / len(vals) if vals else 0.0
-
-    averages = {
-        "age": avg("age"),
-        "academic_pressure": avg("academic_pressure"),
-        "study_hours": avg("study_hours"),
-        "financial_stress": avg("financial_stress"),
-        "study_satisfaction": avg("study_satisfaction"),
-        "cgpa": avg("cgpa"),
-    }
+    variables = data.get("variables") or []
+    if isinstance(variables, list):
+        variables = {campo: None for campo in variables}
+    if not isinstance(variables, dict) or not variables:
+        return jsonify({"error": "Indica al menos una variable a barrer"}), 400
 
-    # ----------- MÉTRICAS DE USO (metrics_events) -----------
-
-    metrics_items = r.lrange("metrics_events", 0, -1)
-    metrics = {}
-
-    if metrics_items:
-        events = [json.loads(x) for x in metrics_items]
-
-        submits = [e for e in events if e.get("eventType") == "submit"]
-        abandons = [e for e in events if e.get("eventType") == "abandon"]
-
-        # --- tiempos totales ---
-        times_ms = [
-            e.get("totalMs")
-            for e in submits
-            if isinstance(e.get("totalMs"), (int, float))
-        ]
-
-        avg_completion = median_completion = p90_completion = None
-
-        if times_ms:
-            times_sec = sorted([t / 1000.0 for t in times_ms])
-            n = len(times_sec)
-            avg_completion = sum(times_sec) / n
-
-            # mediana
-            if n % 2 == 1:
-                median_completion = times_sec[n // 2]
-            else:
-                median_completion = (times_sec[n // 2 - 1] + times_sec[n // 2]) / 2
-
-            # p90 (posición 90%)
-            idx_p90 = int(0.9 * (n - 1))
-            p90_completion = times_sec[idx_p90]
-
-        # --- tiempos por campo ---
-        field_sums = {}
-        field_counts = {}
-
-        for e in submits:
-            fields_ms = e.get("fieldsMs") or {}
-            if isinstance(fields_ms, dict):
-                for field, ms in fields_ms.items():
-                    try:
-                        v = float(ms)
-                    except (TypeError, ValueError):
-                        continue
-                    field_sums[field] = field_sums.get(field, 0.0) + v
-                    field_counts[field] = field_counts.get(field, 0) + 1
-
-        field_times = {}
-        for field, total_ms in field_sums.items():
-            count = field_counts.get(field, 1)
-            field_times[field] = {
-                "avg_seconds": (total_ms / count) / 1000.0
-            }
+    barridos = {}
+    for campo, opciones in variables.items():
+        if campo not in VALORES_BARRIDO:
+            return jsonify({
+                "error": f"Variable no soportada: {campo}",
+                "soportadas": list(VALORES_BARRIDO),
+            }), 400
+        opciones = VALORES_BARRIDO[campo] if opciones is None else opciones
+        if not isinstance(opciones, list) or not opciones:
+            return jsonify({"error": f"Valores inválidos para {campo}"}), 400
+        barridos[campo] = opciones
+
+    puntos = 1
+    for opciones in barridos.values():
+        puntos *= len(opciones)
+    if puntos > MAX_PUNTOS_BARRIDO:
+        return jsonify({
+            "error": f"La malla tiene {puntos} puntos; el límite es {MAX_PUNTOS_BARRIDO}"
+        }), 400
 
-        # --- distribución por dispositivo ---
-        device_counts = {}
-        for e in events:
-            dev = (e.get("device") or {}).get("type", "unknown")
-            device_counts[dev] = device_counts.get(dev, 0) + 1
+    estado = registro_modelos.actual
+    if estado is None:
+        return modelo_no_disponible()
 
-        total_dev = sum(device_counts.values()) or 1
-        device_distribution = {
-            k: {"count": v, "pct": (v / total_dev) * 100.0}
-            for k, v in device_counts.items()
-        }
+    try:
+        matriz, forma = estado.codificador.codificar_malla(valores, barridos)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Valores inválidos: {e}"}), 400
 
-        # --- distribución por tamaño de pantalla ---
-        def bucket_for_width(w):
-            try:
-                w = int(w)
-            except (TypeError, ValueError):
-                return "unknown"
-            if w < 480:
-                return "0-479"
-            if w < 768:
-                return "480-767"
-            if w < 1024:
-                return "768-1023"
-            if w < 1440:
-                return "1024-1439"
-            return "1440+"
-
-        viewport_counts = {}
-        for e in events:
-            width = (e.get("device") or {}).get("width")
-            bucket = bucket_for_width(width)
-            viewport_counts[bucket] = viewport_counts.get(bucket, 0) + 1
-
-        total_view = sum(viewport_counts.values()) or 1
-        viewport_distribution = {
-            k: {"count": v, "pct": (v / total_view) * 100.0}
-            for k, v in viewport_counts.items()
-        }
+    _, probabilidades = estado.motor.predecir_lote(matriz)
+    _, base = estado.motor.predecir(estado.codificador.codificar(valores))
 
-        # --- completados vs abandonos ---
-        completed = len(submits)
-        abandoned = len(abandons)
-        total_sessions = completed + abandoned or 1
+    return jsonify({
+        "variables": list(barridos),
+        "valores": barridos,
+        "probabilidad_base": base,
+        "probabilidades": probabilidades.reshape(forma).tolist(),
+        "model_version": estado.version,
+    })
 
-        abandonment = {
-            "completed": completed,
-            "abandoned": abandoned,
-            "completed_pct": (completed / total_sessions) * 100.0,
-            "abandoned_pct": (abandoned / total_sessions) * 100.0,
-        }
 
-        # --- timestamps ---
-        ts_list = []
-        for e in submits:
-            ts = (
-                e.get("timestampEnvio")
-                or e.get("completedAt")
-                or e.get("startedAt")
-            )
-            if ts:
-                ts_list.append(ts)
-
-        first_submission_at = min(ts_list) if ts_list else None
-        last_submission_at = max(ts_list) if ts_list else None
-
-        metrics = {
-            "avg_completion_seconds": avg_completion,
-            "median_completion_seconds": median_completion,
-            "p90_completion_seconds": p90_completion,
-            "field_times": field_times,
-            "device_distribution": device_distribution,
-            "viewport_distribution": viewport_distribution,
-            "abandonment": abandonment,
-            "first_submission_at": first_submission_at,
-            "last_submission_at": last_submission_at,
-        }
+@app.post("/api/predict/csv")
+def api_predict_csv():
+    """
+    Puntúa un CSV con el formato de StudentDepressionDataset.csv.
+    Acepta el archivo como campo "archivo" (multipart) o como cuerpo crudo.
+    La respuesta se transmite por bloques en NDJSON (por defecto) o CSV
+    (?formato=csv), sin cargar el archivo completo en memoria.
+    """
+    estado = registro_modelos.actual
+    if estado is None:
+        return modelo_no_disponible()
+
+    formato = request.args.get("formato", "ndjson")
+    if formato not in FORMATOS_CSV:
+        return jsonify({"error": f"Formato no soportado: {formato}"}), 400
+
+    try:
+        tam_bloque = int(request.args.get("bloque", TAM_BLOQUE_CSV))
+    except ValueError:
+        return jsonify({"error": "El tamaño de bloque debe ser un entero"}), 400
+    if tam_bloque <= 0:
+        return jsonify({"error": "El tamaño de bloque debe ser mayor a 0"}), 400
+
+    temporal = None
+    archivo = request.files.get("archivo")
+    if archivo is not None:
+        # Flask cierra los archivos del multipart al terminar la vista, antes
+        # de que se transmita la respuesta; se copian a un temporal propio
+        # que cierra transmitir_puntuaciones.
+        temporal = tempfile.TemporaryFile()
+        try:
+            shutil.copyfileobj(archivo.stream, temporal)
+            temporal.seek(0)
+        except Exception:
+            temporal.close()
+            raise
+        origen = temporal
+    else:
+        origen = request.stream
+
+    bloques = puntuar_bloques(
+        origen, estado.motor, estado.codificador.columnas, tam_bloque
+    )
+    mimetype = "text/csv" if formato == "csv" else "application/x-ndjson"
+    return Response(
+        stream_with_context(transmitir_puntuaciones(bloques, formato, temporal)),
+        mimetype=mimetype,
+    )
+
+
+def transmitir_puntuaciones(bloques, formato, temporal=None):
+    """
+    Serializa los bloques de puntuar_bloques. Si el CSV falla a mitad de la
+    lectura, la respuesta termina con un registro de error en lugar de
+    cortarse. El temporal se cierra al terminar, también si el cliente corta
+    la conexión (Flask cierra el generador).
+    """
+    try:
+        yield from serializar(bloques, formato)
+    except Exception as e:
+        mensaje = str(e).strip()
+        print(f"❌ Error puntuando CSV: {mensaje}")
+        yield linea_error(f"CSV inválido: {mensaje}", formato)
+    finally:
+        if temporal is not None:
+            temporal.close()
+
+
+@app.get("/api/predict/microlotes")
+def api_microlotes():
+    """
+    Histogramas de tamaño de lote y espera en cola del programador de
+    micro-lotes, para ajustar PREDICT_LOTE_TAM y PREDICT_LOTE_ESPERA_MS.
+    """
+    if programador is None:
+        return jsonify({"activo": False})
+    return jsonify({"activo": True, **programador.estadisticas()})
+
+
+@app.get("/api/predict/cache")
+def api_cache():
+    """
+    Aciertos y fallos de la caché de predicciones.
+    """
+    if cache is None:
+        return jsonify({"activo": False})
+    return jsonify({"activo": True, **cache.estadisticas()})
+
+
+# Máximo de cubetas que puede sumar una consulta de /api/stats por rango
+MAX_CUBETAS_RANGO = 2000
+
+
+def parsear_instante(valor):
+    """
+    Epoch en segundos o fecha ISO 8601 (sin zona = UTC) -> epoch.
+    Lanza ValueError si no es un instante representable (nan, inf o fuera
+    del rango de datetime).
+    """
+    try:
+        instante = float(valor)
+    except ValueError:
+        fecha = datetime.fromisoformat(valor)
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=timezone.utc)
+        instante = fecha.timestamp()
+    try:
+        datetime.fromtimestamp(instante, timezone.utc)
+    except (OverflowError, OSError, ValueError):
+        raise ValueError(f"Instante fuera de rango: {valor}")
+    return instante
+
+
+@app.get("/api/stats")
+def api_stats():
+    """
+    Estadísticas históricas. Con ?from= (y opcionalmente ?to= y
+    ?granularity=minute|hour|day) se calculan solo para ese rango, sumando
+    las cubetas de tiempo.
+    """
+    if request.args.get("from"):
+        return api_stats_rango()
+
+    # ----------- PREDICCIONES (agregados en Redis) -----------
+    # Los mantiene agregador.py; None mientras no se inicializan
+    resumen = resumen_predicciones(r)
+    if not resumen or not resumen["total_registros"]:
+        return jsonify({"total_registros": 0})
+
+    # ----------- MÉTRICAS DE USO (agregados en Redis) -----------
+    metrics = resumen_metricas(r) or {}
 
     return jsonify(
         {
-            "total_registros": total,
-            "gender_distribution": gender_distribution,
-            "risk_distribution": risk_distribution,
-            "family_history_yes_pct": pct(fam_yes),
-            "suicidal_thoughts_yes_pct": pct(sui_yes),
-            "sleep_distribution": sleep_distribution,
-            "dietary_distribution": dietary_distribution,
-            "averages": averages,
+            **resumen,
             "metrics": metrics,  # <-- NUEVO BLOQUE
         }
     )
 
+def api_stats_rango():
+    granularidad = request.args.get("granularity", "hour")
+    if granularidad not in GRANULARIDADES:
+        return jsonify({
+            "error": f"granularity debe ser una de: {', '.join(GRANULARIDADES)}"
+        }), 400
+
+    try:
+        desde = parsear_instante(request.args["from"])
+        hasta = parsear_instante(request.args.get("to") or str(time.time()))
+    except ValueError:
+        return jsonify({"error": "from/to deben ser epoch en segundos o fechas ISO 8601"}), 400
+
+    if hasta < desde:
+        return jsonify({"error": "from debe ser anterior a to"}), 400
+    if contar_cubetas(desde, hasta, granularidad) > MAX_CUBETAS_RANGO:
+        return jsonify({
+            "error": f"El rango excede {MAX_CUBETAS_RANGO} cubetas; usa una granularidad mayor"
+        }), 400
+
+    return jsonify({
+        "rango": {
+            "from": datetime.fromtimestamp(desde, timezone.utc).isoformat(),
+            "to": datetime.fromtimestamp(hasta, timezone.utc).isoformat(),
+            "granularity": granularidad,
+        },
+        **resumen_rango(r, desde, hasta, granularidad),
+    })
+
+
+@app.post("/api/stats/cohortes")
+def api_stats_cohortes():
+    """
+    Conteo de una cohorte de predicciones (solo admins). Cuerpo:
+      {"filtros": {"risk": "high", "sleep": ["Less than 5 hours"],
+                   "family_history": "Yes"},
+       "agrupar": "gender"}
+    Los valores de un mismo atributo se combinan con OR y los atributos
+    entre sí con AND.
+    """
+    if not admin_autenticado():
+        return jsonify({"error": "No autorizado"}), 401
+
+    data = request.get_json(force=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Se esperaba un objeto {filtros, agrupar}"}), 400
+
+    if not r.exists(cohortes.MARCA_KEY):
+        return jsonify({"error": "El agregador todavía no termina de indexar las cohortes"}), 503
+
+    try:
+        resultado = cohortes.consultar(r, data.get("filtros") or {}, data.get("agrupar"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(resultado)
+
+
 @app.post("/api/metrics")
 def save_metrics():
     try:
@@ -463,8 +659,8 @@ def save_metrics():
             # Guardamos el nuevo timestamp con expiración (para no llenar Redis)
             r.set(key, str(now_ts), ex=300)  # 5 minutos
 
-        # Guardamos como evento en una lista de Redis
-        r.rpush("metrics_events", json.dumps(data))
+        # Al stream de métricas; los agregados los actualiza agregador.py
+        guardar_evento_metrica(r, data)
 
         return jsonify({"status": "ok"}), 201
 
@@ -474,6 +670,35 @@ def save_metrics():
             "message": str(e),
         }), 500
 
+
+# ---------- FORO ----------
+
+# Scripts de escritura del foro: se invocan por SHA
+foro.cargar_scripts(r)
+
+
+# Likes diferidos (opcional): se activa con FORO_LIKES_DIFERIDOS_MS > 0.
+# Los likes se acumulan en memoria y se escriben juntos cada N ms.
+
+def crear_acumulador_likes():
+    intervalo_ms = float(os.environ.get("FORO_LIKES_DIFERIDOS_MS", "0"))
+    if intervalo_ms <= 0:
+        return None
+    acumulador = AcumuladorLikes(r, intervalo_ms)
+    atexit.register(acumulador.detener)
+    # Con "python app.py", SIGTERM terminaría sin correr atexit; uvicorn
+    # instala sus propios manejadores después y sale normalmente
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+        try:
+            signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        except ValueError:
+            pass  # solo se puede desde el hilo principal
+    return acumulador
+
+
+acumulador_likes = crear_acumulador_likes()
+
+
 @app.route('/api/foro/test', methods=['GET'])
 def test_redis():
     """Prueba la conexión a Redis"""
@@ -499,6 +724,8 @@ def limpiar_foro():
     """Elimina todos los datos del foro"""
     try:
         keys = r.keys('foro:*')
+        if acumulador_likes:
+            acumulador_likes.olvidar()
         if keys:
             deleted = r.delete(*keys)
             print(f"🗑️  Se eliminaron {deleted} claves del foro")
@@ -543,52 +770,34 @@ def debug_foro():
 
 @app.route('/api/foro/publicaciones', methods=['GET'])
 def obtener_publicaciones():
-    """Obtiene todas las publicaciones del foro"""
+    """Obtiene una página de publicaciones del foro (?cursor=&limite=)"""
     try:
         orden = request.args.get('orden', 'recientes')
-        
-        pattern = 'foro:post:*'
-        keys = r.keys(pattern)
-        publicaciones = []
-        
-        for key in keys:
-            # Saltar claves especiales
-            if ':respuestas' in key or ':counter' in key:
-                continue
-            
-            # Verificar tipo
-            key_type = r.type(key)
-            if key_type != 'hash':
-                print(f"⚠️  Clave {key} es tipo {key_type}, eliminando...")
-                r.delete(key)
-                continue
-            
-            # Obtener datos
-            data = r.hgetall(key)
-            if not data:
-                continue
-            
-            post_id = key.split(':')[-1]
-            
-            publicaciones.append({
-                'id': post_id,
-                'contenido': data.get('contenido', ''),
-                'timestamp': int(data.get('timestamp', 0)),
-                'likes': int(data.get('likes', 0)),
-                'respuestas_count': int(data.get('respuestas_count', 0))
-            })
-        
-        # Ordenar
-        if orden == 'populares':
-            publicaciones.sort(key=lambda x: (x['likes'], x['respuestas_count']), reverse=True)
-        else:
-            publicaciones.sort(key=lambda x: x['timestamp'], reverse=True)
-        
+        try:
+            limite = foro.parsear_limite(request.args.get('limite'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        foro.asegurar_indices(r)
+
+        # recientes, populares o tendencia (populares con decaimiento)
+        indice = foro.INDICES.get(orden, foro.RECIENTES_KEY)
+        try:
+            publicaciones, siguiente, total = foro.pagina(
+                r, indice, request.args.get('cursor'), limite
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if acumulador_likes:
+            acumulador_likes.fusionar(publicaciones)
+
         print(f"✅ Se obtuvieron {len(publicaciones)} publicaciones")
-        
+
         return jsonify({
             'publicaciones': publicaciones,
-            'total': len(publicaciones)
+            'total': total,
+            'siguiente_cursor': siguiente
         })
     
     except Exception as e:
@@ -615,23 +824,10 @@ def crear_publicacion():
         
         post_id = str(uuid.uuid4())
         timestamp = int(datetime.now().timestamp() * 1000)
-        post_key = f'foro:post:{post_id}'
-        
-        # Verificar que no exista
-        if r.exists(post_key):
-            print(f"⚠️  Clave {post_key} ya existe, eliminando...")
-            r.delete(post_key)
         
-        # Guardar como Hash con strings
-        r.hset(post_key, 'contenido', contenido)
-        r.hset(post_key, 'timestamp', str(timestamp))
-        r.hset(post_key, 'likes', '0')
-        r.hset(post_key, 'respuestas_count', '0')
-        
-        # Verificar
-        saved = r.hgetall(post_key)
+        # Hash e índices en un solo MULTI/EXEC
+        foro.crear_publicacion(r, post_id, contenido, timestamp)
         print(f"✅ Publicación creada: {post_id}")
-        print(f"📦 Datos guardados: {saved}")
         
         return jsonify({
             'id': post_id,
@@ -648,42 +844,23 @@ def crear_publicacion():
 
 @app.route('/api/foro/publicaciones/<post_id>/respuestas', methods=['GET'])
 def obtener_respuestas(post_id):
-    """Obtiene las respuestas de una publicación"""
+    """Obtiene una página de respuestas de una publicación (?cursor=&limite=)"""
     try:
-        post_key = f'foro:post:{post_id}'
-        
-        # Verificar que existe
-        if not r.exists(post_key):
+        try:
+            limite = foro.parsear_limite(request.args.get('limite'))
+            pagina = foro.pagina_respuestas(r, post_id, request.args.get('cursor'), limite)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if pagina is None:
             return jsonify({'error': 'Publicación no encontrada'}), 404
-        
-        # Obtener lista de respuestas
-        respuestas_key = f'foro:post:{post_id}:respuestas'
-        respuesta_ids = r.lrange(respuestas_key, 0, -1)
-        
-        respuestas = []
-        for resp_id in respuesta_ids:
-            resp_key = f'foro:respuesta:{resp_id}'
-            
-            # Verificar tipo
-            if r.type(resp_key) != 'hash':
-                print(f"⚠️  Respuesta {resp_id} tiene tipo incorrecto, eliminando...")
-                r.delete(resp_key)
-                continue
-            
-            data = r.hgetall(resp_key)
-            if data:
-                respuestas.append({
-                    'id': resp_id,
-                    'contenido': data.get('contenido', ''),
-                    'timestamp': int(data.get('timestamp', 0))
-                })
-        
-        # Ordenar por timestamp
-        respuestas.sort(key=lambda x: x['timestamp'], reverse=True)
-        
+
+        # La lista ya viene de la más nueva a la más vieja (LPUSH)
+        respuestas, siguiente, total = pagina
         return jsonify({
             'respuestas': respuestas,
-            'total': len(respuestas)
+            'total': total,
+            'siguiente_cursor': siguiente
         })
     
     except Exception as e:
@@ -697,18 +874,6 @@ def obtener_respuestas(post_id):
 def crear_respuesta(post_id):
     """Crea una respuesta a una publicación"""
     try:
-        post_key = f'foro:post:{post_id}'
-        
-        # Verificar que la publicación existe
-        if not r.exists(post_key):
-            return jsonify({'error': 'Publicación no encontrada'}), 404
-        
-        # Verificar que sea un hash
-        if r.type(post_key) != 'hash':
-            print(f"⚠️  Post {post_id} no es hash, eliminando y rechazando...")
-            r.delete(post_key)
-            return jsonify({'error': 'Publicación corrupta'}), 400
-        
         data = request.get_json()
         contenido = data.get('contenido', '').strip()
         
@@ -721,18 +886,16 @@ def crear_respuesta(post_id):
         resp_id = str(uuid.uuid4())
         timestamp = int(datetime.now().timestamp() * 1000)
         
-        # Guardar respuesta como Hash
-        resp_key = f'foro:respuesta:{resp_id}'
-        r.hset(resp_key, 'contenido', contenido)
-        r.hset(resp_key, 'timestamp', str(timestamp))
-        r.hset(resp_key, 'post_id', post_id)
-        
-        # Agregar a la lista de respuestas
-        respuestas_key = f'foro:post:{post_id}:respuestas'
-        r.lpush(respuestas_key, resp_id)
-        
-        # Incrementar contador
-        r.hincrby(post_key, 'respuestas_count', 1)
+        # Verifica la publicación, guarda la respuesta, la agrega a la lista
+        # e incrementa el contador y los índices en un solo script
+        try:
+            total = foro.crear_respuesta(r, post_id, resp_id, contenido, timestamp)
+        except ValueError as e:
+            print(f"⚠️  Post {post_id} no es hash, eliminado y rechazado")
+            return jsonify({'error': str(e)}), 400
+
+        if total is None:
+            return jsonify({'error': 'Publicación no encontrada'}), 404
         
         print(f"✅ Respuesta creada: {resp_id} para post {post_id}")
         
@@ -752,22 +915,22 @@ def crear_respuesta(post_id):
 def agregar_reaccion(post_id):
     """Agrega una reacción (like) a una publicación"""
     try:
-        post_key = f'foro:post:{post_id}'
-        
-        if not r.exists(post_key):
-            return jsonify({'error': 'Publicación no encontrada'}), 404
-        
-        # Verificar tipo
-        if r.type(post_key) != 'hash':
-            print(f"⚠️  Post {post_id} no es hash, eliminando...")
-            r.delete(post_key)
-            return jsonify({'error': 'Publicación corrupta'}), 400
-        
         data = request.get_json()
         tipo = data.get('tipo', 'like')
         
         if tipo == 'like':
-            nuevo_valor = r.hincrby(post_key, 'likes', 1)
+            try:
+                if acumulador_likes:
+                    nuevo_valor = acumulador_likes.sumar(post_id)
+                else:
+                    nuevo_valor = foro.sumar_like(r, post_id)
+            except ValueError as e:
+                print(f"⚠️  Post {post_id} no es hash, eliminado")
+                return jsonify({'error': str(e)}), 400
+
+            if nuevo_valor is None:
+                return jsonify({'error': 'Publicación no encontrada'}), 404
+
             print(f"✅ Like agregado a post {post_id}. Total: {nuevo_valor}")
             
             return jsonify({
@@ -1087,6 +1250,75 @@ def admin_me():
     return jsonify({"username": username})
 
 
+def admin_autenticado():
+    """
+    Devuelve el admin del header "Authorization: Bearer <token>", o None.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    return get_user_from_token(auth_header.split(" ", 1)[1])
+
+
+# ---------- ADMINISTRACIÓN DE VERSIONES DEL MODELO ----------
+
+@app.get("/api/modelo")
+def modelo_info():
+    """
+    Versión activa en este worker, puntero en Redis y versiones registradas.
+    """
+    return jsonify({
+        "version_cargada": (
+            registro_modelos.actual.version if registro_modelos.listo else None
+        ),
+        "version_activa": r.get(MODELO_ACTIVO_KEY),
+        "version_anterior": r.get(MODELO_ANTERIOR_KEY),
+        "versiones": registro_modelos.versiones(),
+    })
+
+
+@app.post("/api/modelo/activar")
+def modelo_activar():
+    """
+    Activa una versión registrada. Espera JSON con:
+      - version
+    """
+    if not admin_autenticado():
+        return jsonify({"error": "No autorizado"}), 401
+
+    version = (request.get_json(silent=True) or {}).get("version")
+    if not version:
+        return jsonify({"error": "La versión es obligatoria"}), 400
+
+    try:
+        registro_modelos.activar(version)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+    registro_modelos.revisar()
+    return jsonify({"version_activa": version})
+
+
+@app.post("/api/modelo/rollback")
+def modelo_rollback():
+    """
+    Regresa a la versión anterior del modelo.
+    """
+    if not admin_autenticado():
+        return jsonify({"error": "No autorizado"}), 401
+
+    try:
+        version = registro_modelos.rollback()
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 409
+
+    registro_modelos.revisar()
+    return jsonify({"version_activa": version})
+
+
+APP_LISTA = time.time()
+print(f"⏱️  App lista para atender en {APP_LISTA - ARRANQUE:.2f} s")
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,117 @@
+"""
+Artefacto compacto del modelo: solo lo que necesita la inferencia.
+
+Un archivo binario plano (.lrbin) con:
+  - 4 bytes mágicos b"LRB1" y 4 bytes con el largo del encabezado
+  - encabezado JSON: columnas, clases, versión y número de coeficientes.
+    Si no se indica versión, es una huella del contenido (ver huella)
+  - relleno hasta múltiplo de 64 bytes
+  - coeficientes (float64) seguidos del intercepto (float64)
+
+Al cargarlo, los coeficientes se mapean en memoria (np.memmap de solo
+lectura), así todos los workers que sirven la misma versión comparten las
+mismas páginas físicas. No requiere scikit-learn ni joblib.
+
+Uso desde la terminal:
+    python artefacto.py proyecto_curso.pkl proyecto_curso.lrbin
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+MAGICO = b"LRB1"
+EXTENSION = ".lrbin"
+_ALINEACION = 64
+
+
+class ModeloCompacto:
+    """
+    Expone los mismos atributos que usa la inferencia de un
+    LogisticRegression: feature_names_in_, coef_, intercept_ y classes_.
+    """
+
+    def __init__(self, columnas, coef, intercept, classes, version):
+        self.feature_names_in_ = np.array(columnas, dtype=object)
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.asarray(classes)
+        self.version = version
+
+
+def huella(coef, intercept, clases):
+    """
+    Hash (12 caracteres hex, como las versiones del registro) de los
+    coeficientes, el intercepto y las clases: cambia si cambia el modelo.
+    """
+    contenido = (
+        np.asarray(coef, dtype="<f8").tobytes()
+        + np.asarray(intercept, dtype="<f8").tobytes()
+        + json.dumps(list(clases)).encode("utf-8")
+    )
+    return hashlib.blake2b(contenido, digest_size=6).hexdigest()
+
+
+def exportar(model, ruta, version=None):
+    """
+    Escribe el artefacto compacto de un modelo de regresión logística. Sin
+    `version`, el encabezado lleva la huella del contenido.
+    """
+    coef = np.ascontiguousarray(model.coef_, dtype=np.float64).ravel()
+    intercept = np.asarray(model.intercept_, dtype=np.float64).ravel()
+    clases = np.asarray(model.classes_).tolist()
+    encabezado = json.dumps({
+        "columnas": [str(c) for c in model.feature_names_in_],
+        "clases": clases,
+        "n_coef": int(coef.size),
+        "version": version or huella(coef, intercept, clases),
+    }, ensure_ascii=False).encode("utf-8")
+
+    inicio_datos = len(MAGICO) + 4 + len(encabezado)
+    relleno = -inicio_datos % _ALINEACION
+
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(MAGICO)
+        f.write(struct.pack("<I", len(encabezado)))
+        f.write(encabezado)
+        f.write(b"\0" * relleno)
+        f.write(coef.astype("<f8").tobytes())
+        f.write(intercept.astype("<f8").tobytes())
+    os.replace(temporal, ruta)
+
+
+def cargar(ruta):
+    """
+    Carga un artefacto compacto; los coeficientes quedan mapeados en memoria.
+    """
+    with open(ruta, "rb") as f:
+        if f.read(len(MAGICO)) != MAGICO:
+            raise ValueError(f"{ruta} no es un artefacto {EXTENSION}")
+        (largo,) = struct.unpack("<I", f.read(4))
+        encabezado = json.loads(f.read(largo).decode("utf-8"))
+
+    inicio_datos = len(MAGICO) + 4 + largo
+    inicio_datos += -inicio_datos % _ALINEACION
+    n = encabezado["n_coef"]
+    datos = np.memmap(ruta, dtype="<f8", mode="r", offset=inicio_datos, shape=(n + 1,))
+
+    return ModeloCompacto(
+        encabezado["columnas"],
+        datos[:n].reshape(1, n),
+        datos[n:],
+        encabezado["clases"],
+        encabezado.get("version", ""),
+    )
+
+
+if __name__ == "__main__":
+    import joblib
+
+    origen = sys.argv[1] if len(sys.argv) > 1 else "proyecto_curso.pkl"
+    destino = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(origen)[0] + EXTENSION
+    exportar(joblib.load(origen), destino)
+    print(f"Artefacto compacto escrito en {destino} ({os.path.getsize(destino)} bytes)")
@@ -0,0 +1,137 @@
+"""
+Caché de predicciones en dos niveles.
+
+El formulario tiene un espacio de entradas pequeño (escalas 1-5, tres
+opciones de sueño y de dieta, banderas Sí/No), así que se repiten muchas
+combinaciones idénticas. La clave es un hash del vector de características
+ya codificado más la versión del modelo:
+
+1. LRU en memoria del proceso, con TTL.
+2. Nivel compartido en Redis (pred:cache:<version>:<hash>), con expiración.
+
+Al cambiar el modelo cambia la versión, por lo que las entradas viejas dejan
+de usarse solas (el LRU se vacía y las claves de Redis expiran).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_PREFIX = "pred:cache:"
+
+
+class CachePredicciones:
+    def __init__(self, redis_client, tam_max=4096, ttl=3600):
+        self.r = redis_client
+        self.tam_max = int(tam_max)
+        self.ttl = int(ttl)
+        self.version = None
+
+        self._lru = OrderedDict()  # clave -> (expira_en, prediccion, probabilidad)
+        self._lock = threading.Lock()
+        self.contadores = {"hits_memoria": 0, "hits_redis": 0, "misses": 0}
+
+    @staticmethod
+    def clave(indices, valores):
+        """
+        Hash del vector normalizado (índices y valores de las columnas activas).
+        """
+        return hashlib.blake2b(
+            indices.tobytes() + valores.tobytes(), digest_size=16
+        ).hexdigest()
+
+    def _clave_redis(self, version, clave):
+        return f"{CACHE_PREFIX}{version}:{clave}"
+
+    def _revisar_version(self, version):
+        if version != self.version:
+            self._lru.clear()
+            self.version = version
+
+    def obtener(self, version, clave):
+        """
+        Devuelve (prediccion, probabilidad) o None si no está en caché.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            self._revisar_version(version)
+            entrada = self._lru.get(clave)
+            if entrada is not None:
+                if entrada[0] > ahora:
+                    self._lru.move_to_end(clave)
+                    self.contadores["hits_memoria"] += 1
+                    return entrada[1], entrada[2]
+                del self._lru[clave]
+
+        try:
+            guardado = self.r.get(self._clave_redis(version, clave))
+        except Exception:
+            # Si Redis falla, la caché no debe tumbar la predicción
+            guardado = None
+
+        resultado = None
+        if guardado is not None:
+            try:
+                resultado = self._parsear(guardado)
+            except ValueError:
+                # Entrada corrupta: se cuenta como miss y se borra para que
+                # la siguiente predicción la reemplace
+                try:
+                    self.r.delete(self._clave_redis(version, clave))
+                except Exception:
+                    pass
+
+        if resultado is None:
+            with self._lock:
+                self.contadores["misses"] += 1
+            return None
+
+        with self._lock:
+            self.contadores["hits_redis"] += 1
+            self._guardar_local(version, clave, resultado, ahora)
+        return resultado
+
+    @staticmethod
+    def _parsear(guardado):
+        """
+        "prediccion,probabilidad" -> (int, float). Lanza ValueError si el
+        valor no tiene ese formato o la probabilidad no está en [0, 1].
+        """
+        prediccion, probabilidad = guardado.split(",")
+        resultado = (int(prediccion), float(probabilidad))
+        if not 0.0 <= resultado[1] <= 1.0:
+            raise ValueError(f"Probabilidad fuera de rango: {probabilidad}")
+        return resultado
+
+    def guardar(self, version, clave, resultado):
+        prediccion, probabilidad = resultado
+        with self._lock:
+            self._guardar_local(version, clave, resultado, time.monotonic())
+        try:
+            self.r.set(
+                self._clave_redis(version, clave),
+                f"{prediccion},{probabilidad!r}",
+                ex=self.ttl,
+            )
+        except Exception:
+            pass
+
+    def _guardar_local(self, version, clave, resultado, ahora):
+        self._revisar_version(version)
+        self._lru[clave] = (ahora + self.ttl, resultado[0], resultado[1])
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.tam_max:
+            self._lru.popitem(last=False)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = sum(self.contadores.values())
+            aciertos = self.contadores["hits_memoria"] + self.contadores["hits_redis"]
+            return {
+                **self.contadores,
+                "hit_ratio": aciertos / consultas if consultas else None,
+                "en_memoria": len(self._lru),
+                "tam_max": self.tam_max,
+                "ttl": self.ttl,
+                "version_modelo": self.version,
+            }
@@ -0,0 +1,235 @@
+"""
+Índices de bitmaps para consultar cohortes de predicciones.
+
+Cada predicción recibe un número de secuencia (cohorte:seq) y enciende ese
+bit en un bitmap de Redis por cada valor de atributo que tiene, por ejemplo
+cohorte:sleep:Less than 5 hours o cohorte:risk:high. Una consulta como
+"riesgo alto Y duerme menos de 5 h Y antecedentes familiares, por género"
+se resuelve con BITOP OR (valores de un mismo atributo), BITOP AND (entre
+atributos) y BITCOUNT, sin leer ni decodificar los registros.
+
+Para construir los bitmaps a partir de la lista existente:
+    python estadisticas.py reconstruir
+"""
+import json
+import uuid
+
+from redis.exceptions import WatchError
+
+from inferencia import OPCIONES_DIETA, OPCIONES_GENERO, OPCIONES_SUENO
+
+SEQ_KEY = "cohorte:seq"
+TODOS_KEY = "cohorte:todos"
+# Existe cuando los bitmaps ya incluyen todo el historial de la lista
+MARCA_KEY = "cohorte:reconstruido"
+
+_SI_NO = ["Yes", "No"]
+_ESCALA = ["1", "2", "3", "4", "5"]
+
+# Atributo -> (campo del registro, valores indexados)
+DIMENSIONES = {
+    "risk": ("prediction", ["high", "low"]),
+    "gender": ("gender", OPCIONES_GENERO),
+    "sleep": ("sleep_duration", OPCIONES_SUENO),
+    "diet": ("dietary_habits", OPCIONES_DIETA),
+    "family_history": ("family_history", _SI_NO),
+    "suicidal_thoughts": ("suicidal_thoughts", _SI_NO),
+    "works": ("works", _SI_NO),
+    "academic_pressure": ("academic_pressure", _ESCALA),
+    "financial_stress": ("financial_stress", _ESCALA),
+    "study_satisfaction": ("study_satisfaction", _ESCALA),
+}
+
+
+def clave(dimension, valor):
+    return f"cohorte:{dimension}:{valor}"
+
+
+def _valor(dimension, registro):
+    campo, _ = DIMENSIONES[dimension]
+    valor = registro.get(campo)
+    if dimension == "risk":
+        return "high" if valor == 1 else "low"
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def claves_registro(registro):
+    """
+    Bitmaps en los que se enciende el bit de un registro.
+    """
+    claves = [TODOS_KEY]
+    for dimension, (_, valores) in DIMENSIONES.items():
+        valor = _valor(dimension, registro)
+        if valor in valores:
+            claves.append(clave(dimension, valor))
+    return claves
+
+
+# Reserva las secuencias (INCRBY) y enciende los bits en el mismo paso: si
+# la reserva y los SETBIT fueran comandos separados, un `reconstruir` que
+# corriera entre ambos reiniciaría cohorte:seq y los bits caerían sobre
+# secuencias que ya usa otro registro.
+# KEYS: cohorte:seq y luego los bitmaps (_todas_las_claves).
+# ARGV: por registro, los índices (en KEYS) de sus bitmaps separados por espacios.
+_LUA_INDEXAR = """
+local n = #ARGV
+local inicio = redis.call('INCRBY', KEYS[1], n) - n
+for i = 1, n do
+    for k in string.gmatch(ARGV[i], '%d+') do
+        redis.call('SETBIT', KEYS[tonumber(k)], inicio + i - 1, 1)
+    end
+end
+return inicio
+"""
+_script_indexar = None
+
+
+def indexar(pipe, registros):
+    """
+    Agrega al pipeline el script que reserva secuencias consecutivas para
+    `registros` y enciende sus bits.
+    """
+    global _script_indexar
+    if _script_indexar is None:
+        _script_indexar = pipe.register_script(_LUA_INDEXAR)
+
+    claves = [SEQ_KEY] + _todas_las_claves()
+    posicion = {c: i for i, c in enumerate(claves, start=1)}
+    argumentos = [
+        " ".join(str(posicion[c]) for c in claves_registro(registro))
+        for registro in registros
+    ]
+    _script_indexar(keys=claves, args=argumentos, client=pipe)
+
+
+def _todas_las_claves():
+    return [TODOS_KEY] + [
+        clave(dimension, valor)
+        for dimension, (_, valores) in DIMENSIONES.items()
+        for valor in valores
+    ]
+
+
+def reconstruir(r, origen, decodificar=json.loads, lote=1000, intentos=10):
+    """
+    Reconstruye todos los bitmaps desde la lista `origen`: la secuencia de
+    cada registro pasa a ser su posición en la lista. Se arman en memoria y
+    se escriben con SET en un solo MULTI/EXEC bajo WATCH (si entra otra
+    predicción mientras tanto, se vuelve a empezar, hasta `intentos` veces;
+    después lanza RuntimeError).
+    """
+    for _ in range(intentos):
+        mapas = {}
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(origen, SEQ_KEY)
+                total = pipe.llen(origen)
+                for inicio in range(0, total, lote):
+                    items = pipe.lrange(origen, inicio, inicio + lote - 1)
+                    for seq, raw in enumerate(items, start=inicio):
+                        try:
+                            claves = claves_registro(decodificar(raw))
+                        except Exception:
+                            continue  # registro corrupto: no se indexa
+                        for c in claves:
+                            mapa = mapas.setdefault(c, bytearray())
+                            if len(mapa) <= seq // 8:
+                                mapa.extend(bytes(seq // 8 + 1 - len(mapa)))
+                            # Redis numera los bits desde el más significativo
+                            mapa[seq // 8] |= 0x80 >> (seq % 8)
+
+                pipe.multi()
+                pipe.delete(*_todas_las_claves())
+                for c, mapa in mapas.items():
+                    pipe.set(c, bytes(mapa))
+                pipe.set(SEQ_KEY, total)
+                pipe.set(MARCA_KEY, 1)
+                pipe.execute()
+                return total
+            except WatchError:
+                continue
+    raise RuntimeError(f"{origen} cambió en cada uno de {intentos} intentos de reconstrucción")
+
+
+def validar_filtros(filtros):
+    """
+    Normaliza {atributo: valor o [valores]} a {atributo: [valores]}.
+    Lanza ValueError si un atributo o valor no está indexado.
+    """
+    if not isinstance(filtros, dict):
+        raise ValueError("filtros debe ser un objeto {atributo: [valores]}")
+
+    normalizados = {}
+    for dimension, valores in filtros.items():
+        if dimension not in DIMENSIONES:
+            raise ValueError(
+                f"Atributo no indexado: {dimension}. Disponibles: {', '.join(DIMENSIONES)}"
+            )
+        if not isinstance(valores, list):
+            valores = [valores]
+        valores = [str(v) for v in valores]
+        permitidos = DIMENSIONES[dimension][1]
+        invalidos = [v for v in valores if v not in permitidos]
+        if not valores or invalidos:
+            raise ValueError(
+                f"Valores de {dimension} deben ser de: {', '.join(permitidos)}"
+            )
+        normalizados[dimension] = valores
+    return normalizados
+
+
+def consultar(r, filtros, agrupar=None):
+    """
+    Cuenta los registros que cumplen todos los filtros (OR entre valores de
+    un atributo, AND entre atributos) y, si se indica `agrupar`, los reparte
+    por los valores de ese atributo. Todo corre en un MULTI/EXEC, así que
+    los conteos salen de una misma foto de los bitmaps.
+    """
+    filtros = validar_filtros(filtros)
+    if agrupar is not None and agrupar not in DIMENSIONES:
+        raise ValueError(f"No se puede agrupar por {agrupar}")
+
+    temporal = f"cohorte:tmp:{uuid.uuid4().hex}"
+    temporales = [temporal]
+
+    pipe = r.pipeline()
+    partes = []
+    for dimension, valores in filtros.items():
+        destino = f"{temporal}:{dimension}"
+        pipe.bitop("OR", destino, *[clave(dimension, v) for v in valores])
+        partes.append(destino)
+    temporales.extend(partes)
+
+    pipe.bitop("AND", temporal, TODOS_KEY, *partes)
+    pipe.bitcount(temporal)
+    pipe.bitcount(TODOS_KEY)
+
+    grupos = DIMENSIONES[agrupar][1] if agrupar else []
+    for valor in grupos:
+        destino = f"{temporal}:grupo:{valor}"
+        pipe.bitop("AND", destino, temporal, clave(agrupar, valor))
+        pipe.bitcount(destino)
+        temporales.append(destino)
+
+    pipe.delete(*temporales)
+    resultados = pipe.execute()
+
+    base = len(partes) + 1
+    total, poblacion = resultados[base], resultados[base + 1]
+    conteos = resultados[base + 3:-1:2]
+
+    respuesta = {
+        "filtros": filtros,
+        "total": total,
+        "poblacion": poblacion,
+        "pct": (total / poblacion) * 100 if poblacion else 0.0,
+    }
+    if agrupar:
+        respuesta["agrupado_por"] = agrupar
+        respuesta["grupos"] = {
+            valor: {"count": n, "pct": (n / total) * 100 if total else 0.0}
+            for valor, n in zip(grupos, conteos)
+        }
+    return respuesta
@@ -0,0 +1,114 @@
+"""
+Sketch de cuantiles con error relativo acotado (estilo DDSketch).
+
+Cada valor positivo cae en una cubeta logarítmica i = ceil(log_gamma(x)),
+con gamma = (1 + alpha) / (1 - alpha). Todos los valores de una cubeta
+están a menos de `alpha` (error relativo) de su representante, así que
+cualquier cuantil se estima con ese error sin guardar los valores.
+
+El sketch es solo un conjunto de contadores: dos sketches con el mismo
+alpha se fusionan sumando cubeta a cubeta. Por eso se guarda en Redis como
+un hash y se actualiza con HINCRBY, y sketches de distintos periodos se
+combinan sumando sus hashes.
+
+Campos del hash:
+  n        cantidad de valores
+  sum      suma de los valores (para el promedio exacto)
+  zero     valores <= 0
+  b:<i>    valores en la cubeta i
+"""
+import math
+
+ALPHA = 0.01
+
+
+class SketchCuantiles:
+    def __init__(self, alpha=ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.cubetas = {}
+        self.ceros = 0
+        self.n = 0
+        self.suma = 0.0
+
+    def indice(self, valor):
+        return math.ceil(math.log(valor) / self._log_gamma)
+
+    def representante(self, indice):
+        # Punto medio (en error relativo) de (gamma^(i-1), gamma^i]
+        return 2 * self.gamma ** indice / (self.gamma + 1)
+
+    def _validar(self, valor):
+        valor = float(valor)
+        if not math.isfinite(valor):
+            raise ValueError(f"Valor no finito: {valor}")
+        return valor
+
+    def incrementos(self, valor):
+        """
+        Campos del hash que hay que incrementar al agregar `valor`:
+        (contadores, sumas). Lanza ValueError si `valor` no es finito.
+        """
+        valor = self._validar(valor)
+        campo = "zero" if valor <= 0 else f"b:{self.indice(valor)}"
+        return {"n": 1, campo: 1}, {"sum": valor}
+
+    def agregar(self, valor, veces=1):
+        valor = self._validar(valor)
+        if valor <= 0:
+            self.ceros += veces
+        else:
+            i = self.indice(valor)
+            self.cubetas[i] = self.cubetas.get(i, 0) + veces
+        self.n += veces
+        self.suma += valor * veces
+
+    def fusionar(self, otro):
+        if otro.alpha != self.alpha:
+            raise ValueError("Solo se fusionan sketches con el mismo alpha")
+        for i, c in otro.cubetas.items():
+            self.cubetas[i] = self.cubetas.get(i, 0) + c
+        self.ceros += otro.ceros
+        self.n += otro.n
+        self.suma += otro.suma
+        return self
+
+    @classmethod
+    def desde_hash(cls, campos, alpha=ALPHA):
+        """
+        Reconstruye el sketch a partir de un HGETALL (valores como texto).
+        """
+        sketch = cls(alpha)
+        for campo, valor in campos.items():
+            if campo.startswith("b:"):
+                sketch.cubetas[int(campo[2:])] = int(valor)
+        sketch.ceros = int(campos.get("zero", 0))
+        sketch.n = int(campos.get("n", 0))
+        sketch.suma = float(campos.get("sum", 0.0))
+        return sketch
+
+    def a_hash(self):
+        campos = {f"b:{i}": c for i, c in self.cubetas.items()}
+        campos.update({"n": self.n, "sum": self.suma, "zero": self.ceros})
+        return campos
+
+    def promedio(self):
+        return self.suma / self.n if self.n else None
+
+    def cuantil(self, q):
+        """
+        Valor en la posición q * (n - 1) de los datos ordenados, con error
+        relativo <= alpha. None si el sketch está vacío.
+        """
+        if not self.n:
+            return None
+        rango = q * (self.n - 1)
+        acumulado = self.ceros
+        if rango < acumulado:
+            return 0.0
+        for i in sorted(self.cubetas):
+            acumulado += self.cubetas[i]
+            if rango < acumulado:
+                return self.representante(i)
+        return self.representante(max(self.cubetas))
@@ -0,0 +1,267 @@
+"""
+Entrenamiento del modelo sin notebook ni gráficas.
+
+Versión importable de proyecto_curso.py: lee el CSV con tipos explícitos
+(categorías como códigos enteros), arma la matriz one-hot directamente en
+formato disperso, entrena la regresión logística y devuelve el modelo junto
+con un reporte de evaluación, tiempo de entrenamiento y memoria pico.
+
+Las columnas resultantes tienen los mismos nombres y el mismo orden que
+pd.get_dummies(..., drop_first=True) del notebook, así que el modelo es
+intercambiable con proyecto_curso.pkl.
+
+Uso desde la terminal:
+    python entrenamiento.py --salida proyecto_curso.pkl --solver lbfgs --C 1.0
+"""
+import argparse
+import json
+import logging
+import resource
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import (
+    accuracy_score,
+    confusion_matrix,
+    f1_score,
+    precision_score,
+    recall_score,
+    roc_auc_score,
+)
+from sklearn.model_selection import train_test_split
+
+logger = logging.getLogger(__name__)
+
+CSV_PATH = "StudentDepressionDataset.csv"
+OBJETIVO = "Depression"
+
+COLUMNAS_NUMERICAS = [
+    "id",
+    "Age",
+    "Academic Pressure",
+    "Work Pressure",
+    "CGPA",
+    "Study Satisfaction",
+    "Job Satisfaction",
+    "Work/Study Hours",
+    "Financial Stress",
+]
+
+# Mismo orden que la lista de columnas de pd.get_dummies en el notebook
+COLUMNAS_CATEGORICAS = [
+    "Gender",
+    "City",
+    "Profession",
+    "Sleep Duration",
+    "Dietary Habits",
+    "Degree",
+    "Have you ever had suicidal thoughts ?",
+    "Family History of Mental Illness",
+]
+
+# Desde scikit-learn 1.8 `penalty` está obsoleto y se usa l1_ratio
+_USA_L1_RATIO = tuple(int(x) for x in sklearn.__version__.split(".")[:2]) >= (1, 8)
+
+DTYPES = {
+    **{col: "float64" for col in COLUMNAS_NUMERICAS},
+    **{col: "category" for col in COLUMNAS_CATEGORICAS},
+    OBJETIVO: "int8",
+}
+
+
+def leer_dataset(csv_path=CSV_PATH):
+    """
+    Lee el CSV con tipos explícitos y descarta las filas con valores
+    numéricos faltantes (como el notebook).
+    """
+    data = pd.read_csv(csv_path, usecols=list(DTYPES), dtype=DTYPES)
+    filas = len(data)
+    data = data.dropna(subset=COLUMNAS_NUMERICAS).reset_index(drop=True)
+    logger.info("Dataset leído: %d filas (%d descartadas por valores vacíos)",
+                len(data), filas - len(data))
+    return data
+
+
+def codificar_disperso(data):
+    """
+    One-hot disperso equivalente a pd.get_dummies(drop_first=True).
+    Devuelve (matriz CSR, nombres de columnas).
+    """
+    n = len(data)
+    bloques = [sparse.csr_matrix(data[COLUMNAS_NUMERICAS].to_numpy(dtype=np.float64))]
+    columnas = list(COLUMNAS_NUMERICAS)
+
+    for col in COLUMNAS_CATEGORICAS:
+        categorias = data[col].cat.categories
+        if not categorias.is_monotonic_increasing:
+            data[col] = data[col].cat.reorder_categories(sorted(categorias))
+            categorias = data[col].cat.categories
+        codigos = data[col].cat.codes.to_numpy()
+
+        # drop_first: la primera categoría no tiene columna
+        activas = codigos > 0
+        filas = np.flatnonzero(activas)
+        bloques.append(sparse.csr_matrix(
+            (np.ones(len(filas)), (filas, codigos[activas] - 1)),
+            shape=(n, len(categorias) - 1),
+        ))
+        columnas.extend(f"{col}_{categoria}" for categoria in categorias[1:])
+
+    return sparse.hstack(bloques, format="csr"), columnas
+
+
+def evaluar(model, X, y):
+    probabilidades = model.predict_proba(X)[:, 1]
+    predicciones = model.predict(X)
+    return {
+        "accuracy": float(accuracy_score(y, predicciones)),
+        "precision": float(precision_score(y, predicciones)),
+        "recall": float(recall_score(y, predicciones)),
+        "f1": float(f1_score(y, predicciones)),
+        "roc_auc": float(roc_auc_score(y, probabilidades)),
+        "confusion_matrix": confusion_matrix(y, predicciones).tolist(),
+    }
+
+
+def crear_modelo(solver="lbfgs", C=1.0, max_iter=100, penalty="l2", class_weight=None):
+    """
+    LogisticRegression con la penalización indicada ("l2" o "l1").
+    """
+    kwargs = {"solver": solver, "C": C, "max_iter": max_iter, "class_weight": class_weight}
+    if penalty != "l2":
+        if _USA_L1_RATIO and penalty == "l1":
+            kwargs["l1_ratio"] = 1.0
+        else:
+            kwargs["penalty"] = penalty
+    return LogisticRegression(**kwargs)
+
+
+def dividir(X, y, test_size=0.3, random_state=42):
+    """
+    Separación entrenamiento/prueba (misma semilla que el notebook).
+    """
+    return train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+
+def entrenar(csv_path=CSV_PATH, solver="lbfgs", C=1.0, max_iter=100,
+             modelo_previo=None, test_size=0.3, random_state=42,
+             penalty="l2", class_weight=None, medir_memoria=False):
+    """
+    Entrena la regresión logística y devuelve (modelo, reporte).
+
+    Si se pasa `modelo_previo` con las mismas columnas, sus coeficientes se
+    usan como punto de partida (warm start), lo que reduce iteraciones al
+    reentrenar con un dataset que creció.
+
+    Con `medir_memoria` se activa tracemalloc durante el entrenamiento para
+    reportar el pico de memoria de Python. Como encarece cada asignación,
+    solo lo activa la terminal (main); si no, ese pico queda en None.
+    """
+    medir_memoria = medir_memoria and not tracemalloc.is_tracing()
+    if medir_memoria:
+        tracemalloc.start()
+    try:
+        return _entrenar(csv_path, solver, C, max_iter, modelo_previo, test_size,
+                         random_state, penalty, class_weight, medir_memoria)
+    finally:
+        if medir_memoria:
+            tracemalloc.stop()
+
+
+def _entrenar(csv_path, solver, C, max_iter, modelo_previo, test_size,
+              random_state, penalty, class_weight, medir_memoria):
+    inicio = time.perf_counter()
+
+    data = leer_dataset(csv_path)
+    X, columnas = codificar_disperso(data)
+    y = data[OBJETIVO].to_numpy()
+    logger.info("Matriz de entrenamiento: %d x %d (%d valores no nulos)",
+                X.shape[0], X.shape[1], X.nnz)
+
+    X_train, X_test, y_train, y_test = dividir(X, y, test_size, random_state)
+
+    model = crear_modelo(solver, C, max_iter, penalty, class_weight)
+    warm_start = (
+        modelo_previo is not None
+        and list(getattr(modelo_previo, "feature_names_in_", [])) == columnas
+    )
+    if warm_start:
+        model.set_params(warm_start=True)
+        model.coef_ = modelo_previo.coef_.copy()
+        model.intercept_ = modelo_previo.intercept_.copy()
+        logger.info("Warm start con los coeficientes del modelo previo")
+
+    inicio_fit = time.perf_counter()
+    model.fit(X_train, y_train)
+    segundos_fit = time.perf_counter() - inicio_fit
+    model.set_params(warm_start=False)
+    logger.info("Modelo ajustado en %.2f s (%d iteraciones)", segundos_fit, int(model.n_iter_[0]))
+    metricas = evaluar(model, X_test, y_test)
+    # Ajustado con matriz dispersa: se guardan los nombres para la inferencia
+    model.feature_names_in_ = np.array(columnas, dtype=object)
+
+    reporte = {
+        "solver": solver,
+        "C": C,
+        "penalty": penalty,
+        "class_weight": class_weight,
+        "max_iter": max_iter,
+        "warm_start": warm_start,
+        "n_iter": int(model.n_iter_[0]),
+        "filas_entrenamiento": int(X_train.shape[0]),
+        "filas_prueba": int(X_test.shape[0]),
+        "columnas": len(columnas),
+        "metricas_prueba": metricas,
+        "segundos_ajuste": segundos_fit,
+        "segundos_total": time.perf_counter() - inicio,
+        "memoria_pico_python_mb": (
+            tracemalloc.get_traced_memory()[1] / 1e6 if medir_memoria else None
+        ),
+        # ru_maxrss está en KB en Linux
+        "memoria_pico_proceso_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+    logger.info("Accuracy en prueba: %.4f | AUC: %.4f | %.2f s | pico del proceso %.1f MB",
+                reporte["metricas_prueba"]["accuracy"], reporte["metricas_prueba"]["roc_auc"],
+                reporte["segundos_total"], reporte["memoria_pico_proceso_mb"])
+    return model, reporte
+
+
+def guardar(model, reporte, ruta="proyecto_curso.pkl"):
+    """
+    Guarda el modelo y, junto a él, el reporte en <ruta>.json.
+    """
+    joblib.dump(model, ruta)
+    with open(f"{ruta}.json", "w", encoding="utf-8") as f:
+        json.dump(reporte, f, ensure_ascii=False, indent=2)
+    logger.info("Modelo guardado en %s", ruta)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrena el modelo de riesgo de depresión.")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--salida", default="proyecto_curso.pkl")
+    parser.add_argument("--solver", default="lbfgs")
+    parser.add_argument("--C", type=float, default=1.0)
+    parser.add_argument("--max-iter", type=int, default=100)
+    parser.add_argument("--warm-start", metavar="MODELO_PKL",
+                        help="Modelo previo cuyos coeficientes sirven de punto de partida")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    previo = joblib.load(args.warm_start) if args.warm_start else None
+    model, reporte = entrenar(args.csv, args.solver, args.C, args.max_iter, previo,
+                              medir_memoria=True)
+    guardar(model, reporte, args.salida)
+    print(json.dumps(reporte, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,676 @@
+"""
+Agregados de predicciones y métricas de uso.
+
+Las peticiones solo agregan cada predicción y cada evento de uso a un
+stream de Redis (stream:predicciones, stream:metricas). El agregador
+(agregador.py) los lee por grupo de consumidores y, por lotes, actualiza los
+agregados y confirma (XACK) las entradas en el mismo MULTI/EXEC. También los
+recorta (recortar_stream), sin borrar nunca entradas sin confirmar:
+
+- stats:predicciones: contadores y sumas de las predicciones.
+- stats:metricas: dispositivos, pantallas, tiempos por campo, completados
+  y abandonos; stats:metricas:completado, un sketch de cuantiles de los
+  tiempos de completado (ver cuantiles.py); y stats:metricas:envios, los
+  timestamps extremos de envío.
+- Cubetas por minuto, hora y día (con TTL) de todo lo anterior, para
+  responder rangos de tiempo sumando cubetas (resumen_rango).
+- Bitmaps de cohortes (ver cohortes.py).
+
+/api/stats lee los agregados con unos pocos HGETALL.
+
+Las listas "predictions" y "metrics_events" de versiones anteriores se
+incorporan una sola vez al iniciar el agregador (inicializar_agregados), o
+a mano con:
+    python estadisticas.py reconstruir
+"""
+import json
+import logging
+import math
+import os
+import time
+
+from redis.exceptions import ResponseError, WatchError
+
+import cohortes
+import registros as formato_registros
+from cuantiles import SketchCuantiles
+from inferencia import OPCIONES_DIETA, OPCIONES_GENERO, OPCIONES_SUENO
+
+logger = logging.getLogger(__name__)
+
+PREDICCIONES_STREAM = "stream:predicciones"
+METRICAS_STREAM = "stream:metricas"
+GRUPO_AGREGADORES = "agregadores"
+# Entradas que no se pudieron agregar (se confirman y se copian aquí)
+DESCARTADAS_STREAM = "stream:descartadas"
+DESCARTADAS_MAX = 10000
+# Reintentos de una reconstrucción bajo WATCH antes de rendirse
+INTENTOS_RECONSTRUCCION = 10
+# Listas donde se guardaban los registros antes de los streams
+PREDICCIONES_KEY = "predictions"
+METRICAS_KEY = "metrics_events"
+STATS_PREDICCIONES_KEY = "stats:predicciones"
+STATS_METRICAS_KEY = "stats:metricas"
+STATS_COMPLETADO_KEY = "stats:metricas:completado"
+# ZSET con solo el primer y el último timestamp de envío (ver _aplicar)
+STATS_ENVIOS_KEY = "stats:metricas:envios"
+
+# Cubetas por tiempo (UTC): formato de la marca, segundos por cubeta y TTL.
+# Cada entrada incrementa, además del total histórico, la cubeta de cada
+# granularidad; como los agregados son sumables, una cubeta de hora es
+# exactamente la suma de sus minutos y un rango se responde sumando cubetas.
+GRANULARIDADES = {
+    "minute": ("%Y%m%d%H%M", 60, 2 * 86400),
+    "hour": ("%Y%m%d%H", 3600, 35 * 86400),
+    "day": ("%Y%m%d", 86400, 400 * 86400),
+}
+
+# Campo que indica que el hash ya incluye el historial de la lista
+# anterior. Los HINCRBY por sí solos no lo ponen: si un hash no lo tiene,
+# el agregador lo reconstruye antes de empezar a consumir.
+MARCA = "reconstruido"
+
+CAMPOS_PROMEDIO = [
+    "age",
+    "academic_pressure",
+    "study_hours",
+    "financial_stress",
+    "study_satisfaction",
+    "cgpa",
+]
+
+
+def incrementos_prediccion(registro):
+    """
+    Campos que aporta un registro de predicción: {clave: {campo: valor}}.
+    Los enteros son contadores (HINCRBY) y los flotantes sumas (HINCRBYFLOAT).
+    """
+    genero = registro.get("gender", "Other")
+    if genero not in OPCIONES_GENERO:
+        genero = "Other"
+
+    campos = {"total": 1, f"gender:{genero}": 1}
+    if registro.get("prediction") == 1:
+        campos["risk:high"] = 1
+    if registro.get("family_history") == "Yes":
+        campos["family_history:Yes"] = 1
+    if registro.get("suicidal_thoughts") == "Yes":
+        campos["suicidal_thoughts:Yes"] = 1
+    if registro.get("sleep_duration") in OPCIONES_SUENO:
+        campos[f"sleep:{registro['sleep_duration']}"] = 1
+    if registro.get("dietary_habits") in OPCIONES_DIETA:
+        campos[f"diet:{registro['dietary_habits']}"] = 1
+
+    for campo in CAMPOS_PROMEDIO:
+        valor = registro.get(campo)
+        if valor is not None:
+            valor = float(valor)
+            if not math.isfinite(valor):
+                raise ValueError(f"{campo} no es finito")
+            campos[f"sum:{campo}"] = valor
+            campos[f"n:{campo}"] = 1
+
+    return {STATS_PREDICCIONES_KEY: campos}
+
+
+def cubeta_ancho(w):
+    """
+    Cubeta de tamaño de pantalla para un ancho en píxeles.
+    """
+    try:
+        w = int(w)
+    except (TypeError, ValueError):
+        return "unknown"
+    if w < 480:
+        return "0-479"
+    if w < 768:
+        return "480-767"
+    if w < 1024:
+        return "768-1023"
+    if w < 1440:
+        return "1024-1439"
+    return "1440+"
+
+
+def incrementos_metrica(evento):
+    """
+    Campos que aporta un evento de uso: contadores por dispositivo, pantalla
+    y tipo de evento, sumas de tiempos por campo, el tiempo total al sketch
+    de cuantiles y el timestamp de envío a los extremos.
+    """
+    tipo = evento.get("eventType")
+    device = evento.get("device") or {}
+
+    campos = {
+        "eventos": 1,
+        f"device:{device.get('type', 'unknown')}": 1,
+        f"viewport:{cubeta_ancho(device.get('width'))}": 1,
+    }
+    incrementos = {STATS_METRICAS_KEY: campos}
+
+    if tipo == "abandon":
+        campos["abandoned"] = 1
+    if tipo != "submit":
+        return incrementos
+    campos["completed"] = 1
+
+    fields_ms = evento.get("fieldsMs") or {}
+    if isinstance(fields_ms, dict):
+        for campo, ms in fields_ms.items():
+            try:
+                valor = float(ms)
+            except (TypeError, ValueError):
+                continue
+            if not math.isfinite(valor):
+                continue
+            campos[f"field_sum:{campo}"] = valor
+            campos[f"field_n:{campo}"] = 1
+
+    total_ms = evento.get("totalMs")
+    if isinstance(total_ms, (int, float)) and math.isfinite(total_ms):
+        contadores, sumas = SketchCuantiles().incrementos(total_ms / 1000.0)
+        incrementos[STATS_COMPLETADO_KEY] = {**contadores, **sumas}
+
+    ts = evento.get("timestampEnvio") or evento.get("completedAt") or evento.get("startedAt")
+    if ts:
+        incrementos[STATS_ENVIOS_KEY] = {json.dumps(ts)}
+
+    return incrementos
+
+
+def _extremos(miembros):
+    ordenados = sorted(miembros)
+    return {ordenados[0], ordenados[-1]} if ordenados else set()
+
+
+def _acumular(acumulados, incrementos):
+    for clave, campos in incrementos.items():
+        if isinstance(campos, set):
+            # Extremos (mínimo y máximo): solo se conservan esos dos
+            acumulados[clave] = _extremos(acumulados.get(clave, set()) | campos)
+            continue
+        destino = acumulados.setdefault(clave, {})
+        for campo, valor in campos.items():
+            destino[campo] = destino.get(campo, 0) + valor
+
+
+def clave_cubeta(clave, granularidad, ts):
+    formato = GRANULARIDADES[granularidad][0]
+    return f"{clave}:{granularidad}:{time.strftime(formato, time.gmtime(ts))}"
+
+
+def _aplicar(pipe, acumulados, ts=None):
+    """
+    Agrega al pipeline los incrementos acumulados. Con `ts` también los
+    aplica a las cubetas de tiempo correspondientes, con su TTL.
+    """
+    destinos = [(clave, campos, None) for clave, campos in acumulados.items()]
+    if ts is not None:
+        for granularidad, (_, _, ttl) in GRANULARIDADES.items():
+            destinos.extend(
+                (clave_cubeta(clave, granularidad, ts), campos, ttl)
+                for clave, campos in acumulados.items()
+            )
+
+    for clave, campos, ttl in destinos:
+        if isinstance(campos, set):
+            # Todos con score 0: el ZSET queda en orden lexicográfico y
+            # recortarlo a su primer y último elemento deja mínimo y máximo
+            pipe.zadd(clave, {miembro: 0 for miembro in campos})
+            pipe.zremrangebyrank(clave, 1, -2)
+        else:
+            for campo, valor in campos.items():
+                if isinstance(valor, float):
+                    pipe.hincrbyfloat(clave, campo, valor)
+                else:
+                    pipe.hincrby(clave, campo, valor)
+        if ttl:
+            pipe.expire(clave, ttl)
+
+
+def guardar_predicciones(r, registros):
+    """
+    XADD de cada registro (formato compacto, ver registros.py) al stream de
+    predicciones. No se recorta aquí: un MAXLEN al escribir puede borrar
+    entradas que el agregador todavía no leyó (ver recortar_stream).
+    """
+    pipe = r.pipeline(transaction=False)
+    for registro in registros:
+        pipe.xadd(PREDICCIONES_STREAM, {"r": formato_registros.serializar(registro)})
+    pipe.execute()
+
+
+def guardar_evento_metrica(r, evento):
+    """
+    XADD del evento de uso al stream de métricas.
+    """
+    r.xadd(METRICAS_STREAM, {"r": json.dumps(evento)})
+
+
+# ---------- Agregación desde los streams ----------
+
+# Stream -> (decodificar la entrada, incrementos, indexa cohortes)
+LOGS = {
+    PREDICCIONES_STREAM: (formato_registros.decodificar, incrementos_prediccion, True),
+    METRICAS_STREAM: (json.loads, incrementos_metrica, False),
+}
+
+
+def crear_grupos(r):
+    """
+    Crea el grupo de consumidores de cada stream (y el stream) si no existe.
+    """
+    for stream in LOGS:
+        try:
+            r.xgroup_create(stream, GRUPO_AGREGADORES, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+
+def leer_limite_log(variable, defecto):
+    """
+    Entradas (aprox.) que se conservan en un stream según la variable de
+    entorno. 0 significa sin límite y se devuelve None (no se recorta); un
+    valor negativo es un error de configuración.
+    """
+    limite = int(os.environ.get(variable, defecto))
+    if limite < 0:
+        raise ValueError(f"{variable} debe ser 0 (sin límite) o positivo")
+    return limite or None
+
+
+def _id_stream(id_entrada):
+    ms, seq = id_entrada.split("-")
+    return int(ms), int(seq)
+
+
+def recortar_stream(r, stream, max_log, lote=10000):
+    """
+    Recorta `stream` a unas `max_log` entradas, las más nuevas (XTRIM MINID
+    aproximado), sin pasar nunca de la entrada pendiente más antigua del
+    grupo ni de la primera que todavía no entregó. Si el agregador se
+    atrasa, el stream crece más allá de max_log en lugar de perder entradas.
+    Cada llamada borra a lo sumo `lote` entradas. Devuelve cuántas borró.
+    """
+    if max_log is None:
+        return 0
+    exceso = r.xlen(stream) - max_log
+    if exceso <= 0:
+        return 0
+    grupo = next(
+        (g for g in r.xinfo_groups(stream) if g["name"] == GRUPO_AGREGADORES), None
+    )
+    if grupo is None:
+        return 0
+
+    # XTRIM MINID conserva los ids >= minimo. Primero para quedarse con
+    # max_log: la entrada en la posición `exceso` (desde la más vieja)
+    minimo = r.xrange(stream, count=min(exceso, lote) + 1)[-1][0]
+    if grupo["pending"]:
+        frontera = r.xpending(stream, GRUPO_AGREGADORES)["min"]
+    else:
+        # La siguiente a la última entregada
+        ms, seq = _id_stream(grupo["last-delivered-id"])
+        frontera = f"{ms}-{seq + 1}"
+    minimo = min(minimo, frontera, key=_id_stream)
+    return r.xtrim(stream, minid=minimo, approximate=True)
+
+
+def _descartar(pipe, stream, id_entrada, campos, error):
+    pipe.xadd(
+        DESCARTADAS_STREAM,
+        {"stream": stream, "id": id_entrada, "r": (campos or {}).get("r", ""), "error": error},
+        maxlen=DESCARTADAS_MAX,
+        approximate=True,
+    )
+
+
+def procesar_entradas(r, stream, entradas):
+    """
+    Aplica un lote de entradas [(id, campos)] de `stream` a los agregados y
+    las confirma (XACK) en el mismo MULTI/EXEC: o se cuentan y confirman
+    juntas, o ninguna. La marca de tiempo de cada entrada es la de su id.
+
+    Una entrada que no se puede decodificar o agregar se confirma y se copia
+    a stream:descartadas, para que no bloquee al resto del lote. Si Redis
+    rechaza el lote completo, se reintenta entrada por entrada y la que
+    vuelva a fallar se descarta igual.
+    """
+    decodificar, incrementos, indexa_cohortes = LOGS[stream]
+
+    por_minuto = {}  # inicio del minuto -> incrementos acumulados
+    registros = []
+    descartadas = []
+    for id_entrada, campos in entradas:
+        try:
+            registro = decodificar(campos["r"])
+            aportes = incrementos(registro)
+        except Exception as e:
+            descartadas.append((id_entrada, campos, f"{type(e).__name__}: {e}"))
+            continue
+        minuto = int(id_entrada.split("-")[0]) // 60000 * 60
+        _acumular(por_minuto.setdefault(minuto, {}), aportes)
+        registros.append(registro)
+
+
+    pipe = r.pipeline()
+    for minuto, acumulados in por_minuto.items():
+        _aplicar(pipe, acumulados, minuto)
+    if indexa_cohortes and registros:
+        cohortes.indexar(pipe, registros)
+    for id_entrada, campos, error in descartadas:
+        _descartar(pipe, stream, id_entrada, campos, error)
+    pipe.xack(stream, GRUPO_AGREGADORES, *[id_entrada for id_entrada, _ in entradas])
+    try:
+        # Un error al encolar aborta el EXEC entero (no se aplica nada); uno
+        # al ejecutar solo afecta a su comando y el resto ya se aplicó
+        resultados = pipe.execute(raise_on_error=False)
+    except ResponseError as e:
+        if len(entradas) > 1:
+            logger.warning("Lote de %s rechazado (%s); se procesa entrada por entrada", stream, e)
+            return sum(procesar_entradas(r, stream, [entrada]) for entrada in entradas)
+        id_entrada, campos = entradas[0]
+        logger.error("Entrada %s de %s descartada: %s", id_entrada, stream, e)
+        pipe = r.pipeline()
+        _descartar(pipe, stream, id_entrada, campos, f"{type(e).__name__}: {e}")
+        pipe.xack(stream, GRUPO_AGREGADORES, id_entrada)
+        pipe.execute()
+        return 0
+
+    errores = [res for res in resultados if isinstance(res, Exception)]
+    if errores:
+        logger.error("Lote de %s aplicado con %d errores: %s", stream, len(errores), errores[0])
+    if descartadas:
+        logger.warning("%d entradas de %s descartadas", len(descartadas), stream)
+    return len(registros)
+
+
+def _reconstruir(r, origen, hashes, incrementos, extremos=(), lote=1000,
+                 decodificar=json.loads, intentos=INTENTOS_RECONSTRUCCION):
+    """
+    Recalcula los hashes (y los ZSET de extremos) desde la lista `origen`
+    completa. La lista se lee por lotes bajo WATCH y los resultados
+    reemplazan a los actuales con RENAME en el mismo MULTI/EXEC; si entra
+    otro registro mientras tanto se vuelve a empezar, hasta `intentos` veces
+    (después lanza RuntimeError). Devuelve el número de registros procesados.
+    """
+    for _ in range(intentos):
+        acumulados = {}
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(origen)
+                total = pipe.llen(origen)
+                for inicio in range(0, total, lote):
+                    for raw in pipe.lrange(origen, inicio, inicio + lote - 1):
+                        try:
+                            _acumular(acumulados, incrementos(decodificar(raw)))
+                        except Exception:
+                            continue  # registro corrupto: no se cuenta
+
+                pipe.multi()
+                for clave in hashes:
+                    temporal = f"{clave}:reconstruccion"
+                    pipe.delete(temporal)
+                    pipe.hset(temporal, mapping={**acumulados.get(clave, {}), MARCA: 1})
+                    pipe.rename(temporal, clave)
+                for clave in extremos:
+                    pipe.delete(clave)
+                    if acumulados.get(clave):
+                        pipe.zadd(clave, {miembro: 0 for miembro in acumulados[clave]})
+                pipe.execute()
+                return total
+            except WatchError:
+                continue
+    raise RuntimeError(f"{origen} cambió en cada uno de {intentos} intentos de reconstrucción")
+
+
+def reconstruir_agregados(r, lote=1000):
+    return _reconstruir(
+        r, PREDICCIONES_KEY, [STATS_PREDICCIONES_KEY], incrementos_prediccion, lote=lote,
+        decodificar=formato_registros.decodificar,
+    )
+
+
+def reconstruir_cohortes(r, lote=1000):
+    return cohortes.reconstruir(
+        r, PREDICCIONES_KEY, decodificar=formato_registros.decodificar, lote=lote,
+        intentos=INTENTOS_RECONSTRUCCION,
+    )
+
+
+def reconstruir_metricas(r, lote=1000):
+    """
+    Solo incluye lo que siga en el log crudo: si ya estaba recortado, los
+    eventos anteriores no se recuperan.
+    """
+    return _reconstruir(
+        r,
+        METRICAS_KEY,
+        [STATS_METRICAS_KEY, STATS_COMPLETADO_KEY],
+        incrementos_metrica,
+        extremos=[STATS_ENVIOS_KEY],
+        lote=lote,
+    )
+
+
+def inicializar_agregados(r):
+    """
+    Incorpora las listas de versiones anteriores a los agregados que todavía
+    no tienen la marca. Debe correr antes de consumir los streams (lo hace
+    el agregador al arrancar, con un candado para que solo lo haga uno).
+    """
+    if MARCA not in r.hgetall(STATS_PREDICCIONES_KEY):
+        reconstruir_agregados(r)
+    if not r.exists(cohortes.MARCA_KEY):
+        reconstruir_cohortes(r)
+    if MARCA not in r.hgetall(STATS_METRICAS_KEY):
+        reconstruir_metricas(r)
+
+
+def agregados_inicializados(r):
+    return (
+        r.hexists(STATS_PREDICCIONES_KEY, MARCA)
+        and r.hexists(STATS_METRICAS_KEY, MARCA)
+        and bool(r.exists(cohortes.MARCA_KEY))
+    )
+
+
+def _distribucion(agregados, prefijo, opciones, total):
+    distribucion = {}
+    for opcion in opciones:
+        n = int(agregados.get(f"{prefijo}:{opcion}", 0))
+        distribucion[opcion] = {"count": n, "pct": (n / total) * 100 if total else 0.0}
+    return distribucion
+
+
+def resumen_predicciones(r):
+    """
+    Bloque de predicciones de /api/stats a partir del hash de agregados.
+    Devuelve None si el agregador todavía no lo inicializó.
+    """
+    agregados = r.hgetall(STATS_PREDICCIONES_KEY)
+    if MARCA not in agregados:
+        return None
+    return _bloque_predicciones(agregados)
+
+
+def _bloque_predicciones(agregados):
+    total = int(agregados.get("total", 0))
+
+    def pct(n):
+        return (n / total) * 100 if total else 0.0
+
+    high = int(agregados.get("risk:high", 0))
+    low = total - high
+
+    averages = {}
+    for campo in CAMPOS_PROMEDIO:
+        n = int(agregados.get(f"n:{campo}", 0))
+        averages[campo] = float(agregados.get(f"sum:{campo}", 0.0)) / n if n else 0.0
+
+    return {
+        "total_registros": total,
+        "gender_distribution": _distribucion(agregados, "gender", OPCIONES_GENERO, total),
+        "risk_distribution": {
+            "high": {"count": high, "pct": pct(high)},
+            "low": {"count": low, "pct": pct(low)},
+        },
+        "family_history_yes_pct": pct(int(agregados.get("family_history:Yes", 0))),
+        "suicidal_thoughts_yes_pct": pct(int(agregados.get("suicidal_thoughts:Yes", 0))),
+        "sleep_distribution": _distribucion(agregados, "sleep", OPCIONES_SUENO, total),
+        "dietary_distribution": _distribucion(agregados, "diet", OPCIONES_DIETA, total),
+        "averages": averages,
+    }
+
+
+def _conteos(agregados, prefijo):
+    return {
+        campo.split(":", 1)[1]: int(valor)
+        for campo, valor in agregados.items()
+        if campo.startswith(f"{prefijo}:")
+    }
+
+
+def resumen_metricas(r):
+    """
+    Bloque "metrics" de /api/stats a partir de los agregados (sin leer el
+    log crudo). Devuelve None si el agregador todavía no los inicializó.
+    """
+    pipe = r.pipeline(transaction=False)
+    pipe.hgetall(STATS_METRICAS_KEY)
+    pipe.hgetall(STATS_COMPLETADO_KEY)
+    pipe.zrange(STATS_ENVIOS_KEY, 0, -1)
+    agregados, campos_sketch, envios = pipe.execute()
+    if MARCA not in agregados or MARCA not in campos_sketch:
+        return None
+    return _bloque_metricas(agregados, campos_sketch, envios)
+
+
+def _bloque_metricas(agregados, campos_sketch, envios):
+    if not int(agregados.get("eventos", 0)):
+        return {}
+
+    # --- tiempos totales (sketch de cuantiles, error relativo <= 1%) ---
+    sketch = SketchCuantiles.desde_hash(campos_sketch)
+
+    # --- tiempos por campo ---
+    field_times = {}
+    for campo, n in _conteos(agregados, "field_n").items():
+        total_ms = float(agregados.get(f"field_sum:{campo}", 0.0))
+        field_times[campo] = {"avg_seconds": (total_ms / (n or 1)) / 1000.0}
+
+    def distribucion(prefijo):
+        conteos = _conteos(agregados, prefijo)
+        total = sum(conteos.values()) or 1
+        return {k: {"count": v, "pct": (v / total) * 100.0} for k, v in conteos.items()}
+
+    # --- completados vs abandonos ---
+    completed = int(agregados.get("completed", 0))
+    abandoned = int(agregados.get("abandoned", 0))
+    total_sessions = completed + abandoned or 1
+
+    # --- timestamps ---
+    envios = [json.loads(ts) for ts in envios]
+
+    return {
+        "avg_completion_seconds": sketch.promedio(),
+        "median_completion_seconds": sketch.cuantil(0.5),
+        "p90_completion_seconds": sketch.cuantil(0.9),
+        "p99_completion_seconds": sketch.cuantil(0.99),
+        "field_times": field_times,
+        "device_distribution": distribucion("device"),
+        "viewport_distribution": distribucion("viewport"),
+        "abandonment": {
+            "completed": completed,
+            "abandoned": abandoned,
+            "completed_pct": (completed / total_sessions) * 100.0,
+            "abandoned_pct": (abandoned / total_sessions) * 100.0,
+        },
+        "first_submission_at": envios[0] if envios else None,
+        "last_submission_at": envios[-1] if envios else None,
+    }
+
+
+# ---------- Rangos de tiempo ----------
+
+def cubetas_rango(desde, hasta, granularidad):
+    """
+    Inicio (epoch UTC) de cada cubeta que toca el rango [desde, hasta].
+    """
+    paso = GRANULARIDADES[granularidad][1]
+    return list(range(int(desde // paso) * paso, int(hasta) + 1, paso))
+
+
+def contar_cubetas(desde, hasta, granularidad):
+    """
+    len(cubetas_rango(...)) sin construir la lista: el inicio se alinea a la
+    cubeta igual que allí.
+    """
+    paso = GRANULARIDADES[granularidad][1]
+    return max(0, (int(hasta) - int(desde // paso) * paso) // paso + 1)
+
+
+def _sumar_hash(destino, campos):
+    for campo, valor in campos.items():
+        try:
+            valor = int(valor)
+        except ValueError:
+            valor = float(valor)
+        destino[campo] = destino.get(campo, 0) + valor
+
+
+def resumen_rango(r, desde, hasta, granularidad):
+    """
+    Estadísticas del rango [desde, hasta] (epoch) sumando las cubetas de la
+    granularidad indicada, con el mismo formato que los totales históricos
+    más una serie por cubeta (cantidad de predicciones y de riesgo alto).
+    """
+    inicios = cubetas_rango(desde, hasta, granularidad)
+    pipe = r.pipeline(transaction=False)
+    for ts in inicios:
+        pipe.hgetall(clave_cubeta(STATS_PREDICCIONES_KEY, granularidad, ts))
+        pipe.hgetall(clave_cubeta(STATS_METRICAS_KEY, granularidad, ts))
+        pipe.hgetall(clave_cubeta(STATS_COMPLETADO_KEY, granularidad, ts))
+        pipe.zrange(clave_cubeta(STATS_ENVIOS_KEY, granularidad, ts), 0, -1)
+    resultados = pipe.execute()
+
+    predicciones, metricas, sketch, envios = {}, {}, {}, set()
+    serie = []
+    for i, ts in enumerate(inicios):
+        p, m, c, e = resultados[4 * i:4 * i + 4]
+        _sumar_hash(predicciones, p)
+        _sumar_hash(metricas, m)
+        _sumar_hash(sketch, c)
+        envios = _extremos(envios | set(e))
+        serie.append({
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts)),
+            "total_registros": int(p.get("total", 0)),
+            "riesgo_alto": int(p.get("risk:high", 0)),
+            "eventos": int(m.get("eventos", 0)),
+        })
+
+    return {
+        **_bloque_predicciones(predicciones),
+        "metrics": _bloque_metricas(metricas, sketch, sorted(envios)),
+        "serie": serie,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    import redis
+
+    if sys.argv[1:] != ["reconstruir"]:
+        print("Uso: python estadisticas.py reconstruir")
+        sys.exit(2)
+
+    cliente = redis.Redis(
+        host=os.environ.get("REDIS_HOST", "redis"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=True,
+    )
+    print(f"Agregados reconstruidos a partir de {reconstruir_agregados(cliente)} predicciones")
+    print(f"Métricas reconstruidas a partir de {reconstruir_metricas(cliente)} eventos")
+    print(f"Bitmaps de cohortes reconstruidos a partir de {reconstruir_cohortes(cliente)} predicciones")
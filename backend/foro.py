@@ -0,0 +1,462 @@
+"""
+Índices del foro en Redis.
+
+Cada publicación es un hash foro:post:<id>. Para listar el foro sin KEYS
+(que bloquea todo el servidor) se mantienen ZSETs con los ids:
+
+  foro:index:recent    score = timestamp de creación en ms
+  foro:index:popular   score = likes * PESO_LIKE + respuestas_count
+  foro:index:hot       score = likes + respuestas_count + creación / SEGUNDOS_POR_PUNTO
+
+popular reproduce el orden (likes, respuestas_count) de antes. hot es la
+variante con decaimiento: cada SEGUNDOS_POR_PUNTO de antigüedad pesa lo
+mismo que una interacción, así que una publicación nueva aparece arriba y
+baja si no recibe likes ni respuestas. Ambos se actualizan con ZINCRBY en el
+mismo MULTI/EXEC que el HINCRBY del hash: los incrementos son relativos, así
+que likes concurrentes nunca dejan el índice distinto del hash.
+
+El feed recorre un índice por páginas con un cursor y trae los hashes de
+cada página en un solo pipeline, así que su costo depende del tamaño de la
+página y no de cuántas publicaciones hay.
+
+El cursor es "<score>:<id>" de la última publicación entregada. Dentro de un
+mismo score Redis ordena por id, así que (score, id) identifica la posición
+aunque dos publicaciones compartan score, y las publicaciones nuevas no
+desplazan las páginas siguientes. La página siguiente se ubica con ZREVRANK
+de esa publicación, así que muchos empates (todas las de 0 likes en popular)
+no se leen enteros. En popular y hot el score cambia con cada like, así que
+una publicación que sube mientras se pagina puede repetirse o saltarse; es
+lo esperable de un ranking en vivo.
+
+Las publicaciones creadas antes del índice se incorporan una vez con SCAN
+(ver asegurar_indices).
+
+Cada escritura es una sola ida a Redis y atómica: crear una publicación es
+un MULTI/EXEC, y dar like o responder (que verifican que la publicación
+exista y sea un hash) son scripts Lua que se cargan al arrancar
+(cargar_scripts) y se invocan por SHA con EVALSHA.
+
+Las respuestas de una publicación ya están ordenadas en su lista
+foro:post:<id>:respuestas (LPUSH: la más nueva primero). Se paginan con
+LRANGE usando índices negativos como cursor: LPUSH solo agrega al
+principio, así que la posición contada desde el final no cambia cuando
+llegan respuestas nuevas.
+"""
+import logging
+import os
+
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+RECIENTES_KEY = "foro:index:recent"
+POPULARES_KEY = "foro:index:popular"
+TENDENCIA_KEY = "foro:index:hot"
+# Versión de los índices que ya incluyen las publicaciones anteriores a ellos
+MARCA_KEY = "foro:index:reconstruido"
+VERSION_INDICES = "2"
+
+# Un like pesa más que cualquier cantidad realista de respuestas
+PESO_LIKE = 1_000_000
+SEGUNDOS_POR_PUNTO = int(os.environ.get("FORO_HOT_SEGUNDOS_POR_PUNTO", "3600"))
+
+# orden del query string -> índice
+INDICES = {
+    "recientes": RECIENTES_KEY,
+    "populares": POPULARES_KEY,
+    "tendencia": TENDENCIA_KEY,
+}
+
+LIMITE_PAGINA = 20
+MAX_LIMITE_PAGINA = 100
+
+_indices_listos = False
+
+
+def clave_post(post_id):
+    return f"foro:post:{post_id}"
+
+
+def clave_respuestas(post_id):
+    return f"foro:post:{post_id}:respuestas"
+
+
+def clave_respuesta(resp_id):
+    return f"foro:respuesta:{resp_id}"
+
+
+def puntaje_popular(likes, respuestas):
+    return likes * PESO_LIKE + respuestas
+
+
+def puntaje_tendencia(timestamp, likes, respuestas):
+    return likes + respuestas + timestamp / 1000 / SEGUNDOS_POR_PUNTO
+
+
+def indexar_publicacion(pipe, post_id, timestamp, likes=0, respuestas=0):
+    """
+    Agrega al pipeline los ZADD de una publicación en todos los índices.
+    """
+    pipe.zadd(RECIENTES_KEY, {post_id: timestamp})
+    pipe.zadd(POPULARES_KEY, {post_id: puntaje_popular(likes, respuestas)})
+    pipe.zadd(TENDENCIA_KEY, {post_id: puntaje_tendencia(timestamp, likes, respuestas)})
+
+
+# ---------- Escrituras ----------
+
+# KEYS: post, índice popular, índice hot
+# ARGV: post_id, campo, cantidad, peso popular, peso hot
+_LUA_SUMAR = """
+local tipo = redis.call('TYPE', KEYS[1]).ok
+if tipo == 'none' then return -1 end
+if tipo ~= 'hash' then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+local cantidad = tonumber(ARGV[3])
+local total = redis.call('HINCRBY', KEYS[1], ARGV[2], cantidad)
+redis.call('ZINCRBY', KEYS[2], cantidad * tonumber(ARGV[4]), ARGV[1])
+redis.call('ZINCRBY', KEYS[3], cantidad * tonumber(ARGV[5]), ARGV[1])
+return total
+"""
+
+# KEYS: post, respuesta, lista de respuestas, índice popular, índice hot
+# ARGV: post_id, resp_id, contenido, timestamp, incremento popular, incremento hot
+_LUA_RESPONDER = """
+local tipo = redis.call('TYPE', KEYS[1]).ok
+if tipo == 'none' then return -1 end
+if tipo ~= 'hash' then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+redis.call('HSET', KEYS[2], 'contenido', ARGV[3], 'timestamp', ARGV[4], 'post_id', ARGV[1])
+redis.call('LPUSH', KEYS[3], ARGV[2])
+local total = redis.call('HINCRBY', KEYS[1], 'respuestas_count', 1)
+redis.call('ZINCRBY', KEYS[4], ARGV[5], ARGV[1])
+redis.call('ZINCRBY', KEYS[5], ARGV[6], ARGV[1])
+return total
+"""
+
+# Página siguiente a un cursor (ver pagina). Si la publicación del cursor
+# sigue con el mismo score, su ZREVRANK da la posición exacta aunque haya
+# muchos empates (por ejemplo, todas las de 0 likes en popular) y solo se
+# leen `cantidad` entradas. Si cambió de score o ya no existe, se sigue
+# desde el primer score menor al del cursor.
+# KEYS: índice. ARGV: score del cursor, id del cursor, cantidad
+# Devuelve id, score, id, score... y al final ZCARD del índice.
+_LUA_PAGINA = """
+local cantidad = tonumber(ARGV[3])
+local actual = redis.call('ZSCORE', KEYS[1], ARGV[2])
+local entradas
+if actual and tonumber(actual) == tonumber(ARGV[1]) then
+    local posicion = redis.call('ZREVRANK', KEYS[1], ARGV[2])
+    entradas = redis.call('ZREVRANGE', KEYS[1], posicion + 1, posicion + cantidad, 'WITHSCORES')
+else
+    entradas = redis.call('ZREVRANGEBYSCORE', KEYS[1], '(' .. ARGV[1], '-inf',
+                          'WITHSCORES', 'LIMIT', 0, cantidad)
+end
+entradas[#entradas + 1] = redis.call('ZCARD', KEYS[1])
+return entradas
+"""
+
+_FUENTES = {"sumar": _LUA_SUMAR, "responder": _LUA_RESPONDER, "pagina": _LUA_PAGINA}
+_scripts = {}
+
+
+def cargar_scripts(r):
+    """
+    Registra los scripts y los carga en Redis (SCRIPT LOAD) para que las
+    escrituras solo manden EVALSHA. Si Redis se reinicia y los pierde,
+    redis-py los vuelve a cargar en la primera llamada.
+    """
+    for nombre, fuente in _FUENTES.items():
+        script = r.register_script(fuente)
+        r.script_load(fuente)
+        _scripts[nombre] = script
+
+
+def _script(r, nombre):
+    if nombre not in _scripts:
+        _scripts[nombre] = r.register_script(_FUENTES[nombre])
+    return _scripts[nombre]
+
+
+def _resultado(total):
+    """
+    Código de los scripts -> total, None (no existe) o ValueError (corrupta).
+    """
+    if total == -1:
+        return None
+    if total == -2:
+        raise ValueError("Publicación corrupta")
+    return total
+
+
+def crear_publicacion(r, post_id, contenido, timestamp):
+    """
+    Guarda el hash de la publicación y la agrega a los índices en un
+    MULTI/EXEC.
+    """
+    post_key = clave_post(post_id)
+    pipe = r.pipeline()
+    pipe.delete(post_key)
+    pipe.hset(post_key, mapping={
+        'contenido': contenido,
+        'timestamp': str(timestamp),
+        'likes': '0',
+        'respuestas_count': '0',
+    })
+    indexar_publicacion(pipe, post_id, timestamp)
+    pipe.execute()
+
+
+def encolar_likes(pipe, post_id, cantidad):
+    """
+    Agrega al pipeline el script que suma `cantidad` likes. Su resultado es
+    el nuevo total, -1 si la publicación no existe o -2 si no es un hash.
+    """
+    return _script(pipe, "sumar")(
+        keys=[clave_post(post_id), POPULARES_KEY, TENDENCIA_KEY],
+        args=[post_id, 'likes', cantidad, PESO_LIKE, 1],
+        client=pipe,
+    )
+
+
+def sumar_like(r, post_id):
+    """
+    HINCRBY de likes y ZINCRBY de los índices, atómico. Devuelve el nuevo
+    total de likes o None si la publicación no existe; lanza ValueError si
+    la clave no es un hash (y la borra).
+    """
+    return _resultado(encolar_likes(r, post_id, 1))
+
+
+def crear_respuesta(r, post_id, resp_id, contenido, timestamp):
+    """
+    Guarda la respuesta, la agrega a la lista de la publicación e incrementa
+    respuestas_count y los índices, atómico. Devuelve el nuevo total de
+    respuestas; None y ValueError como en sumar_like.
+    """
+    total = _script(r, "responder")(
+        keys=[clave_post(post_id), clave_respuesta(resp_id), clave_respuestas(post_id),
+              POPULARES_KEY, TENDENCIA_KEY],
+        args=[post_id, resp_id, contenido, timestamp, 1, 1],
+        client=r,
+    )
+    return _resultado(total)
+
+
+# ---------- Lecturas ----------
+
+def _publicacion(post_id, data):
+    return {
+        'id': post_id,
+        'contenido': data.get('contenido', ''),
+        'timestamp': int(data.get('timestamp', 0)),
+        'likes': int(data.get('likes', 0)),
+        'respuestas_count': int(data.get('respuestas_count', 0)),
+    }
+
+
+def cargar_publicaciones(r, ids):
+    """
+    Trae los hashes de `ids` en un solo pipeline, en el mismo orden. Se
+    omiten los ids cuyo hash ya no existe o no es un hash.
+    """
+    pipe = r.pipeline(transaction=False)
+    for post_id in ids:
+        pipe.hgetall(clave_post(post_id))
+    publicaciones = []
+    for post_id, data in zip(ids, pipe.execute(raise_on_error=False)):
+        if isinstance(data, dict) and data:
+            publicaciones.append(_publicacion(post_id, data))
+    return publicaciones
+
+
+# ---------- Cursor ----------
+
+def codificar_cursor(score, post_id):
+    if float(score).is_integer():
+        score = int(score)
+    return f"{score!r}:{post_id}"
+
+
+def parsear_cursor(cursor):
+    """
+    "<score>:<id>" -> (score, id). Lanza ValueError si no tiene ese formato.
+    """
+    score, sep, post_id = cursor.partition(":")
+    if not sep or not post_id:
+        raise ValueError("Cursor inválido")
+    score = float(score)
+    if score != score or score in (float("inf"), float("-inf")):
+        raise ValueError("Cursor inválido")
+    return score, post_id
+
+
+def parsear_limite(valor):
+    """
+    Texto del query string -> tamaño de página. Lanza ValueError si no es un
+    entero entre 1 y MAX_LIMITE_PAGINA.
+    """
+    if valor is None:
+        return LIMITE_PAGINA
+    limite = int(valor)
+    if not 1 <= limite <= MAX_LIMITE_PAGINA:
+        raise ValueError(f"limite debe estar entre 1 y {MAX_LIMITE_PAGINA}")
+    return limite
+
+
+def pagina(r, indice=RECIENTES_KEY, cursor=None, limite=LIMITE_PAGINA):
+    """
+    Una página del feed según `indice`, de mayor a menor score (para
+    recientes, de la más nueva a la más vieja). Devuelve (publicaciones,
+    siguiente cursor o None, total de publicaciones). Son dos idas a Redis:
+    los ids de la página (un pipeline o el script _LUA_PAGINA) y sus hashes.
+    """
+    # Se pide uno de más para saber si hay otra página
+    if cursor is None:
+        pipe = r.pipeline(transaction=False)
+        pipe.zrevrange(indice, 0, limite, withscores=True)
+        pipe.zcard(indice)
+        entradas, total = pipe.execute()
+    else:
+        score, ultimo = parsear_cursor(cursor)
+        *plano, total = _script(r, "pagina")(
+            keys=[indice], args=[repr(score), ultimo, limite + 1], client=r,
+        )
+        entradas = [(plano[i], float(plano[i + 1])) for i in range(0, len(plano), 2)]
+
+    hay_mas = len(entradas) > limite
+    entradas = entradas[:limite]
+    siguiente = None
+    if hay_mas:
+        ultimo_id, ultimo_score = entradas[-1]
+        siguiente = codificar_cursor(ultimo_score, ultimo_id)
+
+    publicaciones = cargar_publicaciones(r, [post_id for post_id, _ in entradas])
+    return publicaciones, siguiente, total
+
+
+def pagina_respuestas(r, post_id, cursor=None, limite=LIMITE_PAGINA):
+    """
+    Una página de respuestas, de la más nueva a la más vieja. `cursor` es
+    el índice negativo (desde el final de la lista) de la primera respuesta
+    de la página. Devuelve (respuestas, siguiente cursor o None, total), o
+    None si la publicación no existe. Son dos idas a Redis: la página de ids
+    y sus hashes.
+    """
+    if cursor is None:
+        inicio = 0
+    else:
+        try:
+            inicio = int(cursor)
+        except ValueError:
+            raise ValueError("Cursor inválido")
+        if inicio >= 0:
+            raise ValueError("Cursor inválido")
+    # Con índices negativos, el fin de la página no puede pasar de -1
+    fin = inicio + limite - 1
+    if inicio < 0 and fin >= 0:
+        fin = -1
+
+    lista = clave_respuestas(post_id)
+    # MULTI para que LLEN y LRANGE vean la misma lista
+    pipe = r.pipeline()
+    pipe.exists(clave_post(post_id))
+    pipe.llen(lista)
+    pipe.lrange(lista, inicio, fin)
+    existe, total, ids = pipe.execute()
+    if not existe:
+        return None
+
+    # Índice negativo de la respuesta que sigue a esta página
+    siguiente = (inicio if inicio < 0 else inicio - total) + len(ids)
+    siguiente = str(siguiente) if ids and siguiente < 0 else None
+
+    pipe = r.pipeline(transaction=False)
+    for resp_id in ids:
+        pipe.hgetall(clave_respuesta(resp_id))
+    respuestas = [
+        {
+            'id': resp_id,
+            'contenido': data.get('contenido', ''),
+            'timestamp': int(data.get('timestamp', 0)),
+        }
+        for resp_id, data in zip(ids, pipe.execute(raise_on_error=False))
+        if isinstance(data, dict) and data
+    ]
+    return respuestas, siguiente, total
+
+
+# ---------- Incorporación de publicaciones anteriores ----------
+
+def _indexar_lote(r, ids):
+    """
+    Lee los hashes de `ids` y escribe sus scores bajo WATCH: si un like o
+    una respuesta los cambia entre la lectura y el MULTI, se vuelve a leer
+    (si no, el ZADD pisaría el ZINCRBY de ese like).
+    """
+    claves = [clave_post(post_id) for post_id in ids]
+    while True:
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(*claves)
+                lectura = pipe.pipeline(transaction=False)
+                for c in claves:
+                    lectura.hgetall(c)
+                hashes = lectura.execute(raise_on_error=False)
+
+                pipe.multi()
+                indexadas = 0
+                for post_id, data in zip(ids, hashes):
+                    if not isinstance(data, dict) or 'timestamp' not in data:
+                        continue
+                    indexar_publicacion(
+                        pipe, post_id, int(data['timestamp']),
+                        int(data.get('likes', 0)), int(data.get('respuestas_count', 0)),
+                    )
+                    indexadas += 1
+                pipe.execute()
+                return indexadas
+            except WatchError:
+                continue
+
+
+def reconstruir_indices(r, lote=500):
+    """
+    Agrega a los índices las publicaciones existentes recorriendo
+    foro:post:* con SCAN (no bloquea el servidor como KEYS). Los ZADD son
+    idempotentes, así que se puede correr con la app en marcha. Devuelve
+    cuántas indexó.
+    """
+    indexadas = 0
+    ids = []
+    for clave in r.scan_iter(match="foro:post:*", count=lote):
+        partes = clave.split(":")
+        # foro:post:<id>:respuestas son las listas de respuestas
+        if len(partes) != 3:
+            continue
+        ids.append(partes[2])
+        if len(ids) >= lote:
+            indexadas += _indexar_lote(r, ids)
+            ids = []
+    if ids:
+        indexadas += _indexar_lote(r, ids)
+
+    r.set(MARCA_KEY, VERSION_INDICES)
+    return indexadas
+
+
+def asegurar_indices(r):
+    """
+    Reconstruye los índices una vez si todavía no incluyen las publicaciones
+    anteriores. Después de la primera verificación no consulta Redis.
+    """
+    global _indices_listos
+    if _indices_listos:
+        return
+    if r.get(MARCA_KEY) != VERSION_INDICES:
+        indexadas = reconstruir_indices(r)
+        logger.info("Índices del foro reconstruidos: %d publicaciones", indexadas)
+    _indices_listos = True
@@ -0,0 +1,308 @@
+"""
+Codificación de los datos del formulario para el modelo de regresión logística.
+
+El modelo se entrenó con las columnas de `pd.get_dummies` (ver proyecto_curso.py),
+así que cada campo del formulario corresponde a una columna numérica o a una
+columna one-hot. En lugar de construir un DataFrame en cada petición, aquí se
+calcula una sola vez (al cargar el modelo) el índice de cada columna y se
+rellena una fila NumPy preasignada.
+"""
+import hashlib
+
+import numpy as np
+
+try:
+    # Misma función que usa scikit-learn en predict_proba
+    from scipy.special import expit as sigmoide
+except ImportError:  # pragma: no cover - entorno sin scipy
+    def sigmoide(z):
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+# Campos numéricos del formulario -> columna del modelo
+CAMPOS_NUMERICOS = {
+    "age": "Age",
+    "academic_pressure": "Academic Pressure",
+    "cgpa": "CGPA",
+    "study_hours": "Work/Study Hours",
+    "study_satisfaction": "Study Satisfaction",
+    "financial_stress": "Financial Stress",
+    "work_pressure": "Work Pressure",
+}
+
+# Campos Sí/No del formulario -> columna one-hot que vale 1 con "Yes"
+CAMPOS_BINARIOS = {
+    "family_history": "Family History of Mental Illness_Yes",
+    "suicidal_thoughts": "Have you ever had suicidal thoughts ?_Yes",
+}
+
+# Prefijos de las columnas one-hot de los campos categóricos
+PREFIJO_GENERO = "Gender_"
+PREFIJO_SUENO = "Sleep Duration_"
+PREFIJO_DIETA = "Dietary Habits_"
+
+# Opciones que ofrece el formulario (PrediccionPage.jsx)
+OPCIONES_GENERO = ["Male", "Female", "Other"]
+OPCIONES_SUENO = ["7-8 hours", "Less than 5 hours", "More than 8 hours"]
+OPCIONES_DIETA = ["Moderate", "Others", "Unhealthy"]
+
+# Todos los registros del formulario son de estudiantes
+COLUMNA_PROFESION = "Profession_Student"
+
+# Valores por defecto para los barridos "qué pasaría si" (/api/predict/whatif)
+VALORES_BARRIDO = {
+    "sleep_duration": OPCIONES_SUENO,
+    "dietary_habits": OPCIONES_DIETA,
+    "academic_pressure": [1, 2, 3, 4, 5],
+    "financial_stress": [1, 2, 3, 4, 5],
+    "study_satisfaction": [1, 2, 3, 4, 5],
+    "study_hours": list(range(0, 13)),
+}
+
+
+def parsear_datos(data):
+    """
+    Valida y convierte el JSON recibido en /api/predict.
+    Lanza KeyError, ValueError o TypeError si faltan datos o no son válidos.
+    """
+    works = data["works"]
+    return {
+        "age": int(data["age"]),
+        "gender": data["gender"],
+        "academic_pressure": float(data["academic_pressure"]),
+        "cgpa": float(data["cgpa"]),
+        "study_hours": float(data["study_hours"]),
+        "study_satisfaction": float(data["study_satisfaction"]),
+        "financial_stress": float(data["financial_stress"]),
+        "family_history": data["family_history"],
+        "suicidal_thoughts": data["suicidal_thoughts"],
+        "sleep_duration": data["sleep_duration"],
+        "dietary_habits": data["dietary_habits"],
+        "works": works,
+        "work_pressure": (
+            float(data.get("work_pressure", 0.0)) if works == "Yes" else 0.0
+        ),
+    }
+
+
+class CodificadorEstudiante:
+    """
+    Traduce los datos ya parseados de un estudiante a una fila con el orden
+    de columnas del modelo. Se construye una vez por modelo cargado.
+    """
+
+    def __init__(self, columnas):
+        self.columnas = list(columnas)
+        self.n_columnas = len(self.columnas)
+        indice = {col: i for i, col in enumerate(self.columnas)}
+
+        # Fila base: todo en 0 salvo las columnas constantes
+        self.fila_base = np.zeros(self.n_columnas, dtype=np.float64)
+        if COLUMNA_PROFESION in indice:
+            self.fila_base[indice[COLUMNA_PROFESION]] = 1.0
+        self.indices_base = np.flatnonzero(self.fila_base).tolist()
+        self.valores_base = self.fila_base[self.indices_base].tolist()
+
+        # (campo, índice) para los campos numéricos que existen en el modelo
+        self.numericos = [
+            (campo, indice[col])
+            for campo, col in CAMPOS_NUMERICOS.items()
+            if col in indice
+        ]
+        self.binarios = [
+            (campo, indice[col])
+            for campo, col in CAMPOS_BINARIOS.items()
+            if col in indice
+        ]
+
+        # Valor de la opción -> índice de su columna one-hot.
+        # Las opciones sin columna (la categoría base de drop_first) no aparecen.
+        self.categoricos = [
+            ("gender", self._indices_onehot(indice, PREFIJO_GENERO)),
+            ("sleep_duration", self._indices_onehot(indice, PREFIJO_SUENO)),
+            ("dietary_habits", self._indices_onehot(indice, PREFIJO_DIETA)),
+        ]
+
+    @staticmethod
+    def _indices_onehot(indice, prefijo):
+        return {
+            col[len(prefijo):]: i
+            for col, i in indice.items()
+            if col.startswith(prefijo)
+        }
+
+    def codificar(self, valores, fila=None):
+        """
+        Llena `fila` (o una copia nueva de la fila base) con los valores de un
+        estudiante y la devuelve.
+        """
+        if fila is None:
+            fila = self.fila_base.copy()
+        else:
+            fila[:] = self.fila_base
+
+        for campo, i in self.numericos:
+            fila[i] = valores[campo]
+        for campo, i in self.binarios:
+            if valores[campo] == "Yes":
+                fila[i] = 1.0
+        for campo, opciones in self.categoricos:
+            i = opciones.get(valores[campo])
+            if i is not None:
+                fila[i] = 1.0
+
+        return fila
+
+    def activos(self, valores):
+        """
+        Versión dispersa de `codificar`: devuelve solo los índices y valores de
+        las columnas distintas de cero (unas 15 de las ~110 del modelo).
+        """
+        indices = list(self.indices_base)
+        datos = list(self.valores_base)
+
+        for campo, i in self.numericos:
+            indices.append(i)
+            datos.append(valores[campo])
+        for campo, i in self.binarios:
+            if valores[campo] == "Yes":
+                indices.append(i)
+                datos.append(1.0)
+        for campo, opciones in self.categoricos:
+            i = opciones.get(valores[campo])
+            if i is not None:
+                indices.append(i)
+                datos.append(1.0)
+
+        return np.array(indices, dtype=np.intp), np.array(datos, dtype=np.float64)
+
+    def codificar_malla(self, valores, barridos):
+        """
+        Matriz con todas las combinaciones de los valores de `barridos`
+        ({campo: [valores]}) aplicadas sobre la fila del estudiante. La fila
+        base se replica y cada variable se escribe por broadcasting, sin
+        recodificar punto por punto. Devuelve (matriz, forma de la malla).
+        """
+        campos = list(barridos)
+        forma = tuple(len(barridos[campo]) for campo in campos)
+        matriz = np.tile(self.codificar(valores), (int(np.prod(forma)), 1))
+        # Posición de cada punto de la malla en cada eje
+        posiciones = np.indices(forma).reshape(len(forma), -1)
+
+        numericos = dict(self.numericos)
+        categoricos = dict(self.categoricos)
+        filas = np.arange(matriz.shape[0])
+
+        for eje, campo in enumerate(campos):
+            opciones = barridos[campo]
+            if campo in numericos:
+                matriz[:, numericos[campo]] = np.asarray(opciones, dtype=np.float64)[posiciones[eje]]
+            elif campo in categoricos:
+                columnas_onehot = categoricos[campo]
+                matriz[:, list(columnas_onehot.values())] = 0.0
+                # -1 para la categoría base (sin columna one-hot)
+                indices = np.array([columnas_onehot.get(o, -1) for o in opciones])[posiciones[eje]]
+                activas = indices >= 0
+                matriz[filas[activas], indices[activas]] = 1.0
+            else:
+                raise KeyError(campo)
+
+        return matriz, forma
+
+    def codificar_lote(self, lista_valores):
+        """
+        Codifica varios estudiantes en una matriz (n_estudiantes x n_columnas).
+        """
+        matriz = np.empty((len(lista_valores), self.n_columnas), dtype=np.float64)
+        for i, valores in enumerate(lista_valores):
+            self.codificar(valores, matriz[i])
+        return matriz
+
+
+class MotorLogistico:
+    """
+    Inferencia de la regresión logística sin pasar por scikit-learn.
+
+    Usa directamente coef_, intercept_ y classes_ del modelo entrenado:
+    z = x·w + b, probabilidad = sigmoide(z) y la etiqueta sale del mismo z
+    (z > 0, igual que LogisticRegression.predict). Así cada petición hace un
+    solo producto punto en lugar de predict + predict_proba con sus
+    validaciones.
+    """
+
+    def __init__(self, coef, intercept, classes, columnas=None):
+        coef = np.asarray(coef, dtype=np.float64).reshape(1, -1)
+        if len(classes) != 2:
+            raise ValueError("MotorLogistico solo soporta clasificación binaria")
+        # (n_columnas, 1) contiguo, igual que coef_.T en decision_function
+        self.coef_t = np.ascontiguousarray(coef.T)
+        self.pesos = coef[0]
+        self.intercepto = np.asarray(intercept, dtype=np.float64).reshape(1)
+        self.clases = np.asarray(classes)
+        self.columnas = None if columnas is None else np.asarray(columnas, dtype=object)
+        # Tabla estática de razones de momios (odds ratios) por columna,
+        # la misma interpretación que hace el notebook a mano
+        self.odds_ratios = np.exp(self.pesos)
+        # Huella de los parámetros: cambia si cambia el modelo
+        self.version = hashlib.blake2b(
+            self.coef_t.tobytes() + self.intercepto.tobytes() + self.clases.tobytes(),
+            digest_size=8,
+        ).hexdigest()
+
+    @classmethod
+    def desde_modelo(cls, model):
+        return cls(model.coef_, model.intercept_, model.classes_, model.feature_names_in_)
+
+    def decision_lote(self, matriz):
+        matriz = np.asarray(matriz, dtype=np.float64)
+        return (matriz @ self.coef_t + self.intercepto).ravel()
+
+    def predecir_lote(self, matriz):
+        """
+        Devuelve (etiquetas, probabilidades de la clase positiva) para cada fila.
+        """
+        z = self.decision_lote(matriz)
+        return self.clases[(z > 0).astype(np.intp)], sigmoide(z)
+
+    def predecir(self, fila):
+        etiquetas, probabilidades = self.predecir_lote(np.reshape(fila, (1, -1)))
+        return int(etiquetas[0]), float(probabilidades[0])
+
+    def predecir_activos(self, indices, valores):
+        """
+        Ruta rápida para filas dispersas: solo multiplica las columnas activas
+        que devuelve CodificadorEstudiante.activos.
+        """
+        z = float(self.pesos[indices] @ valores + self.intercepto[0])
+        return int(self.clases[int(z > 0)]), float(sigmoide(z))
+
+    def explicar_activos(self, indices, valores, k=5):
+        """
+        Igual que `predecir_activos`, pero en la misma pasada devuelve las k
+        contribuciones (coef × valor) de mayor magnitud, con su razón de momios.
+        Devuelve (etiqueta, probabilidad, explicación).
+        """
+        coef = self.pesos[indices]
+        contribuciones = coef * valores
+        z = float(contribuciones.sum() + self.intercepto[0])
+
+        k = min(max(int(k), 0), len(indices))
+        orden = np.argsort(-np.abs(contribuciones), kind="stable")[:k]
+        principales = [
+            {
+                "feature": None if self.columnas is None else str(self.columnas[indices[j]]),
+                "value": float(valores[j]),
+                "coef": float(coef[j]),
+                "contribution": float(contribuciones[j]),
+                "odds_ratio": float(self.odds_ratios[indices[j]]),
+                "odds_multiplier": float(np.exp(contribuciones[j])),
+            }
+            for j in orden
+        ]
+        explicacion = {
+            "intercept": float(self.intercepto[0]),
+            "logit": z,
+            "contributions": principales,
+        }
+        return int(self.clases[int(z > 0)]), float(sigmoide(z)), explicacion
+
@@ -0,0 +1,260 @@
+"""
+Likes con escritura diferida para publicaciones muy activas.
+
+Sin esto, cada like es un EVALSHA sobre el mismo hash. Con el acumulador,
+los likes de una publicación ya conocida solo suman un contador en memoria
+y un hilo los escribe cada `intervalo_ms` en un solo pipeline: un script por
+publicación con la cantidad acumulada (HINCRBY + ZINCRBY de los índices,
+igual que un like normal).
+
+- El primer like a una publicación se escribe directo: así se verifica que
+  existe (404 / publicación corrupta) y se conoce su total.
+- Las respuestas suman los likes pendientes al último total conocido, así
+  que cada cliente ve su conteo subir aunque todavía no esté en Redis.
+- Cada publicación del lote se evalúa por separado: si su script falla (por
+  ejemplo, un campo likes que no es entero) sus likes se descartan y se
+  registra el error, sin afectar a las demás ni reaplicar las que sí se
+  escribieron.
+- Si la conexión falla durante el envío no se sabe qué parte del lote se
+  aplicó, así que esos likes no se reintentan (reintentar podría contarlos
+  dos veces): se registran como inciertos y las publicaciones se olvidan
+  para que su siguiente like vaya directo y traiga el total real.
+- detener() escribe lo pendiente antes de salir (app.py lo registra con
+  atexit). Un proceso que muere sin salir normalmente pierde a lo sumo los
+  likes de un intervalo.
+
+Medición de la ganancia sobre una sola publicación:
+    python likes_diferidos.py medir --likes 20000 --hilos 8
+"""
+import logging
+import threading
+
+import foro
+
+logger = logging.getLogger(__name__)
+
+
+class AcumuladorLikes:
+    """
+    - intervalo_ms: cada cuánto se escriben los likes pendientes
+    - max_conocidos: publicaciones cuyo total se recuerda; pasado ese
+      número se olvidan las más antiguas (su siguiente like va directo)
+    """
+
+    def __init__(self, r, intervalo_ms=100.0, max_conocidos=10000):
+        self.r = r
+        self.intervalo = max(1.0, float(intervalo_ms)) / 1000.0
+        self.max_conocidos = max(1, int(max_conocidos))
+
+        self.escrituras = 0
+        self.likes_escritos = 0
+        self.descartados = 0
+        self.inciertos = 0
+
+        self._pendientes = {}
+        self._en_vuelo = {}
+        self._conocidos = {}
+        self._lock = threading.Lock()
+        self._vaciando = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(
+            target=self._bucle, name="likes-diferidos", daemon=True
+        )
+        self._hilo.start()
+
+    def sumar(self, post_id):
+        """
+        Registra un like. Devuelve el total que debe ver el cliente o None si
+        la publicación no existe; lanza ValueError si está corrupta.
+        """
+        with self._lock:
+            if post_id in self._conocidos:
+                self._pendientes[post_id] = self._pendientes.get(post_id, 0) + 1
+                return self._conocidos[post_id] + self._sin_escribir(post_id)
+
+        total = foro.sumar_like(self.r, post_id)
+        if total is None:
+            return None
+        with self._lock:
+            self._recordar(post_id, total)
+            return self._conocidos[post_id] + self._sin_escribir(post_id)
+
+    def pendientes(self, post_id):
+        with self._lock:
+            return self._sin_escribir(post_id)
+
+    def fusionar(self, publicaciones):
+        """
+        Suma los likes pendientes a publicaciones leídas de Redis.
+        """
+        with self._lock:
+            for publicacion in publicaciones:
+                publicacion['likes'] += self._sin_escribir(publicacion['id'])
+        return publicaciones
+
+    def olvidar(self):
+        """
+        Descarta lo pendiente y lo conocido (por ejemplo, al limpiar el foro).
+        """
+        with self._lock:
+            self._pendientes.clear()
+            self._en_vuelo.clear()
+            self._conocidos.clear()
+
+    def vaciar(self):
+        """
+        Escribe los likes pendientes en un pipeline. Devuelve cuántos escribió.
+        """
+        with self._vaciando:
+            with self._lock:
+                # Mientras se escriben, los likes del lote se siguen sumando
+                # en las lecturas (en vuelo) para que el conteo no baje
+                lote, self._pendientes = self._pendientes, {}
+                self._en_vuelo = lote
+            if not lote:
+                return 0
+
+            pipe = self.r.pipeline(transaction=False)
+            for post_id, cantidad in lote.items():
+                foro.encolar_likes(pipe, post_id, cantidad)
+            try:
+                totales = pipe.execute(raise_on_error=False)
+            except Exception as e:
+                self.inciertos += sum(lote.values())
+                logger.error(
+                    "Conexión perdida al escribir %d likes; no se sabe si se aplicaron: %s",
+                    sum(lote.values()), e,
+                )
+                with self._lock:
+                    for post_id in lote:
+                        self._conocidos.pop(post_id, None)
+                    self._en_vuelo = {}
+                return 0
+
+            escritos = 0
+            with self._lock:
+                for (post_id, cantidad), total in zip(lote.items(), totales):
+                    if isinstance(total, Exception):
+                        self.descartados += cantidad
+                        logger.error("Se descartan %d likes de %s: %s", cantidad, post_id, total)
+                        self._conocidos.pop(post_id, None)
+                    elif total < 0:
+                        # La publicación ya no existe (o no es un hash)
+                        self._conocidos.pop(post_id, None)
+                    else:
+                        self._recordar(post_id, total)
+                        escritos += cantidad
+                self._en_vuelo = {}
+            self.escrituras += 1
+            self.likes_escritos += escritos
+            return escritos
+
+    def detener(self, timeout=1.0):
+        """
+        Detiene el hilo y escribe lo que quede pendiente.
+        """
+        self._detener.set()
+        self._hilo.join(timeout)
+        self.vaciar()
+
+    def estadisticas(self):
+        with self._lock:
+            pendientes = sum(self._pendientes.values())
+        return {
+            "intervalo_ms": self.intervalo * 1000.0,
+            "pendientes": pendientes,
+            "escrituras": self.escrituras,
+            "likes_escritos": self.likes_escritos,
+            "likes_descartados": self.descartados,
+            "likes_inciertos": self.inciertos,
+        }
+
+    def _sin_escribir(self, post_id):
+        # Con el lock tomado
+        return self._pendientes.get(post_id, 0) + self._en_vuelo.get(post_id, 0)
+
+    def _recordar(self, post_id, total):
+        # Con el lock tomado. Los likes no bajan: se queda el mayor total visto
+        self._conocidos[post_id] = max(total, self._conocidos.get(post_id, 0))
+        while len(self._conocidos) > self.max_conocidos:
+            self._conocidos.pop(next(iter(self._conocidos)))
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.vaciar()
+            except Exception as e:
+                logger.error("Error en likes diferidos: %s", e)
+
+
+# ---------- Medición ----------
+
+def medir(r, likes=20000, hilos=8, intervalo_ms=50.0):
+    """
+    Likes por segundo sobre una sola publicación, escribiendo directo y con
+    el acumulador. Crea una publicación de prueba y la borra al terminar.
+    """
+    import time
+    import uuid
+
+    post_id = f"bench-{uuid.uuid4()}"
+    foro.cargar_scripts(r)
+    foro.crear_publicacion(r, post_id, "medición de likes", int(time.time() * 1000))
+
+    def correr(sumar):
+        por_hilo = likes // hilos
+        trabajadores = [
+            threading.Thread(target=lambda: [sumar(post_id) for _ in range(por_hilo)])
+            for _ in range(hilos)
+        ]
+        t0 = time.perf_counter()
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        return por_hilo * hilos, time.perf_counter() - t0
+
+    try:
+        n, segundos_directo = correr(lambda p: foro.sumar_like(r, p))
+        acumulador = AcumuladorLikes(r, intervalo_ms)
+        n, segundos_diferido = correr(acumulador.sumar)
+        acumulador.detener()
+        total = int(r.hget(foro.clave_post(post_id), 'likes'))
+    finally:
+        pipe = r.pipeline()
+        pipe.delete(foro.clave_post(post_id))
+        for indice in foro.INDICES.values():
+            pipe.zrem(indice, post_id)
+        pipe.execute()
+
+    return {
+        "likes": n,
+        "hilos": hilos,
+        "likes_por_s_directo": n / segundos_directo,
+        "likes_por_s_diferido": n / segundos_diferido,
+        "escrituras_diferidas": acumulador.escrituras,
+        "total_en_redis": total,
+        "total_esperado": 2 * n,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+
+    import redis
+
+    parser = argparse.ArgumentParser(description="Mide los likes diferidos.")
+    parser.add_argument("accion", choices=["medir"])
+    parser.add_argument("--likes", type=int, default=20000)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--intervalo-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    cliente = redis.Redis(
+        host=os.environ.get("REDIS_HOST", "redis"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=True,
+    )
+    print(json.dumps(medir(cliente, args.likes, args.hilos, args.intervalo_ms), indent=2))
@@ -0,0 +1,193 @@
+"""
+Micro-lotes para /api/predict.
+
+Con tráfico en ráfagas, cada petición concurrente haría su propia llamada
+al modelo con una sola fila. El programador junta en una cola las filas ya
+codificadas de las peticiones en curso y las evalúa como una sola matriz
+cuando se llena el lote o se cumple el tiempo máximo de espera (lo que pase
+primero). Cada petición recibe después su propio resultado.
+"""
+import bisect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as TiempoAgotado
+
+import numpy as np
+
+
+class Histograma:
+    """
+    Histograma con límites fijos: cada valor cuenta en el primer límite
+    >= valor, o en "+Inf" si los supera todos.
+    """
+
+    def __init__(self, limites):
+        self.limites = list(limites)
+        self.conteos = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.suma = 0.0
+        self._lock = threading.Lock()
+
+    def observar(self, valor):
+        i = bisect.bisect_left(self.limites, valor)
+        with self._lock:
+            self.conteos[i] += 1
+            self.total += 1
+            self.suma += valor
+
+    def resumen(self):
+        with self._lock:
+            buckets = {str(l): c for l, c in zip(self.limites, self.conteos)}
+            buckets["+Inf"] = self.conteos[-1]
+            return {
+                "buckets": buckets,
+                "count": self.total,
+                "sum": self.suma,
+                "avg": self.suma / self.total if self.total else None,
+            }
+
+
+class _Pendiente:
+    __slots__ = ("fila", "contexto", "encolado", "futuro")
+
+    def __init__(self, fila, contexto):
+        self.fila = fila
+        self.contexto = contexto
+        self.encolado = time.perf_counter()
+        self.futuro = Future()
+
+
+class ProgramadorMicrolotes:
+    """
+    Agrupa filas de peticiones concurrentes y las evalúa juntas.
+
+    - funcion_lote: recibe (matriz, contexto) y devuelve (etiquetas,
+      probabilidades). Las filas con distinto contexto (por ejemplo, otra
+      versión del modelo) se evalúan en llamadas separadas.
+    - tam_lote: máximo de filas por lote
+    - espera_max_ms: tiempo máximo que espera la primera fila de un lote
+    - max_cola: filas que pueden esperar a la vez; si la cola está llena la
+      petición se evalúa directamente, sin pasar por el lote
+
+    Si el resultado no llega en `timeout` segundos (hilo de lotes trabado o
+    muy lento), la fila se retira del lote y también se evalúa directamente.
+    """
+
+    def __init__(self, funcion_lote, tam_lote=32, espera_max_ms=2.0, max_cola=1024):
+        self.funcion_lote = funcion_lote
+        self.tam_lote = max(1, int(tam_lote))
+        self.espera_max = max(0.0, float(espera_max_ms)) / 1000.0
+        self.max_cola = max(1, int(max_cola))
+
+        self.hist_tam_lote = Histograma([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.hist_espera_ms = Histograma([0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.lotes = 0
+        self.directas = 0
+        self.expiradas = 0
+        self._lock_contadores = threading.Lock()
+
+        self._cola = queue.Queue(maxsize=self.max_cola)
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(
+            target=self._bucle, name="microlotes-prediccion", daemon=True
+        )
+        self._hilo.start()
+
+    def predecir(self, fila, contexto=None, timeout=5.0):
+        """
+        Encola una fila y espera su resultado: (etiqueta, probabilidad).
+        """
+        pendiente = _Pendiente(fila, contexto)
+        try:
+            self._cola.put_nowait(pendiente)
+        except queue.Full:
+            with self._lock_contadores:
+                self.directas += 1
+            return self._directo(fila, contexto)
+        try:
+            return pendiente.futuro.result(timeout=timeout)
+        except TiempoAgotado:
+            # Si el lote todavía no la tomó, cancel() la saca; si ya la está
+            # evaluando, su resultado se ignora
+            pendiente.futuro.cancel()
+            with self._lock_contadores:
+                self.expiradas += 1
+            return self._directo(fila, contexto)
+
+    def _directo(self, fila, contexto):
+        etiquetas, probabilidades = self.funcion_lote(np.reshape(fila, (1, -1)), contexto)
+        return int(etiquetas[0]), float(probabilidades[0])
+
+    def detener(self, timeout=1.0):
+        """
+        Detiene el hilo; las filas que sigan en cola se evalúan antes de salir.
+        """
+        self._detener.set()
+        self._hilo.join(timeout)
+
+    def estadisticas(self):
+        with self._lock_contadores:
+            lotes, directas, expiradas = self.lotes, self.directas, self.expiradas
+        return {
+            "tam_lote": self.tam_lote,
+            "espera_max_ms": self.espera_max * 1000.0,
+            "max_cola": self.max_cola,
+            "en_cola": self._cola.qsize(),
+            "lotes": lotes,
+            "directas": directas,
+            "expiradas": expiradas,
+            "tam_lote_hist": self.hist_tam_lote.resumen(),
+            "espera_cola_ms_hist": self.hist_espera_ms.resumen(),
+        }
+
+    def _bucle(self):
+        while not (self._detener.is_set() and self._cola.empty()):
+            try:
+                primero = self._cola.get(timeout=0.05)
+            except queue.Empty:
+                continue
+
+            lote = [primero]
+            limite = primero.encolado + self.espera_max
+            while len(lote) < self.tam_lote:
+                restante = limite - time.perf_counter()
+                try:
+                    if restante > 0:
+                        lote.append(self._cola.get(timeout=restante))
+                    else:
+                        lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._procesar(lote)
+
+    def _procesar(self, lote):
+        # Las filas cuyo predecir ya se rindió (futuro cancelado) se omiten
+        lote = [p for p in lote if p.futuro.set_running_or_notify_cancel()]
+        if not lote:
+            return
+
+        inicio = time.perf_counter()
+        for pendiente in lote:
+            self.hist_espera_ms.observar((inicio - pendiente.encolado) * 1000.0)
+        self.hist_tam_lote.observar(len(lote))
+        with self._lock_contadores:
+            self.lotes += 1
+
+        grupos = {}
+        for pendiente in lote:
+            grupos.setdefault(id(pendiente.contexto), []).append(pendiente)
+
+        for grupo in grupos.values():
+            try:
+                matriz = np.vstack([pendiente.fila for pendiente in grupo])
+                etiquetas, probabilidades = self.funcion_lote(matriz, grupo[0].contexto)
+            except Exception as e:
+                for pendiente in grupo:
+                    pendiente.futuro.set_exception(e)
+                continue
+
+            for pendiente, etiqueta, probabilidad in zip(grupo, etiquetas, probabilidades):
+                pendiente.futuro.set_result((int(etiqueta), float(probabilidad)))
@@ -0,0 +1,184 @@
+"""
+Puntuación masiva de archivos CSV con el formato de StudentDepressionDataset.csv.
+
+El archivo se lee por bloques de tamaño fijo: cada bloque se codifica en
+one-hot contra las columnas del modelo (model.feature_names_in_), se evalúa
+de forma vectorizada y sus resultados se emiten (NDJSON o CSV) antes de leer
+el siguiente. Así la memoria no crece con el tamaño del archivo.
+
+Uso desde la terminal:
+    python puntuar_csv.py StudentDepressionDataset.csv --salida resultados.ndjson
+    python puntuar_csv.py datos.csv --formato csv --bloque 2000 > resultados.csv
+
+También se expone como POST /api/predict/csv en app.py.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+TAM_BLOQUE = 5000
+FORMATOS = ("ndjson", "csv")
+CAMPOS_CSV = ["row", "id", "prediction", "probability", "error"]
+
+
+class CodificadorCSV:
+    """
+    One-hot por bloques equivalente a pd.get_dummies(..., drop_first=True)
+    seguido de un reindex a las columnas del modelo, pero sin crear las
+    columnas intermedias.
+    """
+
+    def __init__(self, columnas_modelo):
+        self.columnas_modelo = list(columnas_modelo)
+        self.indice = {col: i for i, col in enumerate(self.columnas_modelo)}
+        self.numericas = None  # [(columna CSV, índice)]
+        self.categoricas = None  # [(columna CSV, {valor: índice})]
+
+    def preparar(self, columnas_csv):
+        """
+        Decide qué columnas del CSV son numéricas (existen tal cual en el
+        modelo) y cuáles son categóricas (existen como prefijo "columna_").
+        """
+        self.numericas = []
+        self.categoricas = []
+        for col in columnas_csv:
+            if col in self.indice:
+                self.numericas.append((col, self.indice[col]))
+                continue
+            prefijo = f"{col}_"
+            opciones = {
+                nombre[len(prefijo):]: i
+                for nombre, i in self.indice.items()
+                if nombre.startswith(prefijo)
+            }
+            if opciones:
+                self.categoricas.append((col, opciones))
+
+    def codificar(self, bloque):
+        """
+        Devuelve (matriz, filas_validas). Las filas con valores numéricos
+        faltantes no se evalúan (el entrenamiento también las descarta).
+        """
+        if self.numericas is None:
+            self.preparar(bloque.columns)
+
+        n = len(bloque)
+        matriz = np.zeros((n, len(self.columnas_modelo)), dtype=np.float64)
+        validas = np.ones(n, dtype=bool)
+        filas = np.arange(n)
+
+        for col, i in self.numericas:
+            valores = pd.to_numeric(bloque[col], errors="coerce").to_numpy(
+                dtype=np.float64, na_value=np.nan
+            )
+            validas &= ~np.isnan(valores)
+            matriz[:, i] = valores
+
+        for col, opciones in self.categoricas:
+            indices = bloque[col].map(opciones).to_numpy(dtype=np.float64, na_value=-1)
+            activas = indices >= 0
+            matriz[filas[activas], indices[activas].astype(np.intp)] = 1.0
+
+        return matriz[validas], validas
+
+
+def puntuar_bloques(origen, motor, columnas_modelo, tam_bloque=TAM_BLOQUE):
+    """
+    Generador de resultados por bloque. Cada elemento es una lista de dicts
+    con id, prediction y probability (o error) en el orden del archivo.
+    """
+    codificador = CodificadorCSV(columnas_modelo)
+    fila_global = 0
+
+    for bloque in pd.read_csv(origen, chunksize=tam_bloque):
+        matriz, validas = codificador.codificar(bloque)
+        etiquetas, probabilidades = motor.predecir_lote(matriz)
+
+        ids = bloque["id"].tolist() if "id" in bloque.columns else None
+        resultados = []
+        j = 0
+        for k, valida in enumerate(validas):
+            item = {"row": fila_global + k}
+            if ids is not None:
+                item["id"] = ids[k]
+            if valida:
+                item["prediction"] = int(etiquetas[j])
+                item["probability"] = float(probabilidades[j])
+                j += 1
+            else:
+                item["error"] = "Valores numéricos faltantes"
+            resultados.append(item)
+
+        fila_global += len(bloque)
+        yield resultados
+
+
+def lineas_ndjson(bloques):
+    for resultados in bloques:
+        yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in resultados)
+
+
+def lineas_csv(bloques):
+    buffer = io.StringIO()
+    escritor = csv.DictWriter(buffer, fieldnames=CAMPOS_CSV, extrasaction="ignore")
+
+    escritor.writeheader()
+    for resultados in bloques:
+        escritor.writerows(resultados)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def serializar(bloques, formato):
+    if formato == "csv":
+        return lineas_csv(bloques)
+    return lineas_ndjson(bloques)
+
+
+def linea_error(mensaje, formato):
+    """
+    Registro final cuando el archivo falla a mitad de la transmisión (las
+    filas anteriores ya se enviaron y la respuesta ya salió con 200).
+    """
+    item = {"error": mensaje}
+    if formato == "csv":
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, fieldnames=CAMPOS_CSV, extrasaction="ignore").writerow(item)
+        return buffer.getvalue()
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def main(argv=None):
+    import joblib
+
+    from inferencia import MotorLogistico
+
+    parser = argparse.ArgumentParser(description="Puntúa un CSV de estudiantes por bloques.")
+    parser.add_argument("entrada", help="CSV con el formato de StudentDepressionDataset.csv")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto, stdout)")
+    parser.add_argument("--formato", choices=FORMATOS, default="ndjson")
+    parser.add_argument("--bloque", type=int, default=TAM_BLOQUE, help="Filas por bloque")
+    parser.add_argument("--modelo", default="proyecto_curso.pkl")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.modelo)
+    motor = MotorLogistico.desde_modelo(model)
+    bloques = puntuar_bloques(args.entrada, motor, model.feature_names_in_, args.bloque)
+
+    salida = open(args.salida, "w", encoding="utf-8", newline="") if args.salida else sys.stdout
+    try:
+        for texto in serializar(bloques, args.formato):
+            salida.write(texto)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Registro de versiones del modelo con recarga en caliente.
+
+- Los artefactos se guardan en MODELOS_DIR como <version>.pkl, donde la
+  versión es un hash del contenido del archivo. Junto a cada .pkl se exporta
+  el artefacto compacto <version>.lrbin (ver artefacto.py), que es el que se
+  carga al servir: se mapea en memoria y no necesita scikit-learn.
+- Redis guarda el puntero a la versión activa (modelo:activo), la versión
+  anterior (modelo:anterior) y los metadatos de cada versión.
+- Un hilo vigilante revisa el puntero periódicamente; si cambió, carga el
+  nuevo modelo fuera del camino de las peticiones y lo intercambia de forma
+  atómica (una sola asignación de referencia).
+
+Las peticiones deben tomar `registro.actual` una sola vez y usar ese mismo
+EstadoModelo (versión, codificador y motor) hasta terminar.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+from redis.exceptions import WatchError
+
+import artefacto
+from inferencia import CodificadorEstudiante, MotorLogistico
+
+MODELO_ACTIVO_KEY = "modelo:activo"
+MODELO_ANTERIOR_KEY = "modelo:anterior"
+MODELO_VERSIONES_KEY = "modelo:versiones"
+
+
+class EstadoModelo:
+    """
+    Todo lo que necesita una predicción para una versión concreta del modelo.
+    No se modifica después de creado.
+    """
+
+    def __init__(self, version, model):
+        self.version = version
+        self.model = model
+        self.codificador = CodificadorEstudiante(model.feature_names_in_)
+        self.motor = MotorLogistico.desde_modelo(model)
+
+
+class RegistroModelos:
+    def __init__(self, redis_client, directorio="modelos", intervalo=5.0):
+        self.r = redis_client
+        self.directorio = directorio
+        self.intervalo = float(intervalo)
+        self.actual = None
+        self.entrenando = False
+        self.error_arranque = None
+        self.listo_en = None  # time.time() de la primera carga
+        self._cargados = {}  # version -> EstadoModelo (la actual y la anterior)
+        self._lock = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        os.makedirs(self.directorio, exist_ok=True)
+
+    # ----- administración de versiones -----
+
+    def ruta(self, version, extension=".pkl"):
+        return os.path.join(self.directorio, f"{version}{extension}")
+
+    def registrar(self, ruta_pkl, descripcion=""):
+        """
+        Copia un artefacto (.pkl o .lrbin) al registro y devuelve su versión.
+        Registrar dos veces el mismo archivo devuelve la misma versión.
+        """
+        with open(ruta_pkl, "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+
+        compacto = ruta_pkl.endswith(artefacto.EXTENSION)
+        destino = self.ruta(version, artefacto.EXTENSION if compacto else ".pkl")
+        if not os.path.exists(destino):
+            temporal = f"{destino}.tmp"
+            shutil.copyfile(ruta_pkl, temporal)
+            os.replace(temporal, destino)
+
+        if not compacto and not os.path.exists(self.ruta(version, artefacto.EXTENSION)):
+            import joblib
+
+            artefacto.exportar(
+                joblib.load(destino), self.ruta(version, artefacto.EXTENSION), version
+            )
+
+        metadatos = {
+            "version": version,
+            "origen": os.path.basename(ruta_pkl),
+            "descripcion": descripcion,
+            "registrado": datetime.utcnow().isoformat(),
+        }
+        self.r.hsetnx(MODELO_VERSIONES_KEY, version, json.dumps(metadatos))
+        return version
+
+    def activar(self, version):
+        """
+        Mueve el puntero de la versión activa. Los workers la cargan en su
+        siguiente revisión.
+        """
+        def elegir(pipe):
+            if not pipe.hexists(MODELO_VERSIONES_KEY, version):
+                raise KeyError(f"Versión no registrada: {version}")
+            return version
+
+        return self._mover_puntero(elegir)
+
+    def rollback(self):
+        """
+        Vuelve a la versión anterior (intercambia activa y anterior).
+        """
+        def elegir(pipe):
+            anterior = pipe.get(MODELO_ANTERIOR_KEY)
+            if not anterior:
+                raise KeyError("No hay versión anterior")
+            return anterior
+
+        return self._mover_puntero(elegir)
+
+    def _mover_puntero(self, elegir):
+        """
+        Apunta modelo:activo a la versión que devuelve `elegir(pipe)` y deja
+        la que estaba en modelo:anterior. Se lee y se escribe bajo WATCH en un
+        MULTI/EXEC: si otro admin mueve el puntero entre la lectura y la
+        escritura se vuelve a empezar, así ninguna activación se pierde ni
+        queda como anterior una versión que nunca estuvo activa.
+        """
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(MODELO_ACTIVO_KEY, MODELO_ANTERIOR_KEY)
+                    version = elegir(pipe)
+                    activa = pipe.get(MODELO_ACTIVO_KEY)
+                    if activa != version:
+                        pipe.multi()
+                        if activa:
+                            pipe.set(MODELO_ANTERIOR_KEY, activa)
+                        pipe.set(MODELO_ACTIVO_KEY, version)
+                        pipe.execute()
+                    return version
+                except WatchError:
+                    continue
+
+    def versiones(self):
+        versiones = [json.loads(v) for v in self.r.hvals(MODELO_VERSIONES_KEY)]
+        versiones.sort(key=lambda v: v.get("registrado", ""), reverse=True)
+        return versiones
+
+    def inicializar(self, ruta_pkl, entrenar=None):
+        """
+        Registra el artefacto inicial si todavía no hay versión activa y carga
+        la versión activa en este proceso. Si el artefacto no existe se llama
+        a `entrenar()`, que debe generarlo en `ruta_pkl`.
+        """
+        if not self.r.get(MODELO_ACTIVO_KEY):
+            if not os.path.exists(ruta_pkl):
+                if entrenar is None:
+                    raise FileNotFoundError(ruta_pkl)
+                self.entrenando = True
+                try:
+                    entrenar()
+                finally:
+                    self.entrenando = False
+            version = self.registrar(ruta_pkl, descripcion="modelo inicial")
+            # Si otro worker ganó la carrera, nos quedamos con la suya
+            self.r.set(MODELO_ACTIVO_KEY, version, nx=True)
+        self.revisar()
+
+    def inicializar_en_segundo_plano(self, ruta_pkl, entrenar=None):
+        """
+        Igual que `inicializar`, pero en un hilo aparte para no bloquear el
+        arranque de la app. Al terminar (bien o mal) arranca el vigilante.
+        """
+        def tarea():
+            inicio = time.perf_counter()
+            try:
+                self.inicializar(ruta_pkl, entrenar)
+                print(f"⏱️  Modelo listo en {time.perf_counter() - inicio:.2f} s")
+            except Exception as e:
+                self.error_arranque = str(e)
+                print(f"❌ Error al inicializar el modelo: {e}")
+            finally:
+                self.iniciar_vigilante()
+
+        threading.Thread(target=tarea, name="arranque-modelo", daemon=True).start()
+
+    @property
+    def listo(self):
+        return self.actual is not None
+
+    # ----- carga e intercambio en este proceso -----
+
+    def _cargar(self, version):
+        estado = self._cargados.get(version)
+        if estado is not None:
+            return estado
+
+        ruta_compacta = self.ruta(version, artefacto.EXTENSION)
+        if os.path.exists(ruta_compacta):
+            return EstadoModelo(version, artefacto.cargar(ruta_compacta))
+
+        # Versiones registradas antes del artefacto compacto
+        import joblib
+
+        return EstadoModelo(version, joblib.load(self.ruta(version)))
+
+    def revisar(self):
+        """
+        Carga la versión activa si es distinta de la actual. Devuelve True
+        si hubo intercambio.
+        """
+        version = self.r.get(MODELO_ACTIVO_KEY)
+        if not version or (self.actual is not None and self.actual.version == version):
+            return False
+
+        with self._lock:
+            if self.actual is not None and self.actual.version == version:
+                return False
+            estado = self._cargar(version)
+
+            anterior = self.actual
+            self.actual = estado  # intercambio atómico
+            if self.listo_en is None:
+                self.listo_en = time.time()
+            self._cargados = {version: estado}
+            if anterior is not None:
+                self._cargados[anterior.version] = anterior
+
+        print(f"🔁 Modelo activo: {version}")
+        return True
+
+    def iniciar_vigilante(self):
+        if self._hilo is not None:
+            return
+        self._hilo = threading.Thread(
+            target=self._vigilar, name="vigilante-modelo", daemon=True
+        )
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.revisar()
+            except Exception as e:
+                # Si la carga falla seguimos sirviendo con el modelo actual
+                print(f"❌ Error al recargar el modelo: {e}")
+                time.sleep(self.intervalo)
+
+
+def main(argv=None):
+    """
+    Uso:
+        python registro_modelos.py registrar nuevo_modelo.pkl [--activar]
+        python registro_modelos.py activar <version>
+        python registro_modelos.py rollback
+        python registro_modelos.py listar
+    """
+    import argparse
+
+    import redis
+
+    parser = argparse.ArgumentParser(description="Administra las versiones del modelo.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p_registrar = sub.add_parser("registrar")
+    p_registrar.add_argument("ruta")
+    p_registrar.add_argument("--descripcion", default="")
+    p_registrar.add_argument("--activar", action="store_true")
+    p_activar = sub.add_parser("activar")
+    p_activar.add_argument("version")
+    sub.add_parser("rollback")
+    sub.add_parser("listar")
+    args = parser.parse_args(argv)
+
+    r = redis.Redis(
+        host=os.environ.get("REDIS_HOST", "redis"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=True,
+    )
+    registro = RegistroModelos(r, directorio=os.environ.get("MODELOS_DIR", "modelos"))
+
+    if args.comando == "registrar":
+        version = registro.registrar(args.ruta, args.descripcion)
+        if args.activar:
+            registro.activar(version)
+        print(version)
+    elif args.comando == "activar":
+        print(registro.activar(args.version))
+    elif args.comando == "rollback":
+        print(registro.rollback())
+    else:
+        for v in registro.versiones():
+            print(json.dumps(v, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
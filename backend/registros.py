@@ -0,0 +1,321 @@
+"""
+Formato compacto de los registros de predicción (stream de predicciones y
+lista "predictions" de versiones anteriores).
+
+Un registro JSON repite los nombres de los ~17 campos, la fecha ISO y el
+mensaje completo, aunque el mensaje se deriva de la predicción y la
+probabilidad. El formato compacto guarda:
+
+  "~" + base64(
+      versión (u8) | timestamp en µs (i64) | age (i32)
+      | códigos de gender, family_history, suicidal_thoughts,
+        sleep_duration, dietary_habits, works (u8 cada uno)
+      | academic_pressure, cgpa, study_hours, study_satisfaction,
+        financial_stress, work_pressure (f64 cada uno)
+      | prediction (u8) | probability (f64)
+      | model_version (u8 largo + ASCII; solo en la versión 1)
+      | valores categóricos fuera de las opciones (u8 largo + UTF-8)
+  )
+
+La versión 2 es para los registros de antes del registro de modelos, que
+no tienen la clave model_version: se omite esa sección y la decodificación
+tampoco devuelve la clave.
+
+El mensaje no se guarda: se recalcula con mensaje_riesgo. Los valores
+categóricos que no están entre las opciones del formulario usan el código
+255 y se guardan literales al final, así que la decodificación devuelve
+exactamente el mismo diccionario (mismas claves, orden y valores). Un
+registro que no se puede representar así se sigue guardando en JSON.
+
+Los lectores usan `decodificar`, que acepta ambos formatos.
+
+Uso desde la terminal:
+    python registros.py medir     # memoria y costo de decodificación
+    python registros.py migrar    # convierte los registros JSON existentes
+"""
+import base64
+import json
+import struct
+import time
+from datetime import datetime, timedelta
+
+from inferencia import OPCIONES_DIETA, OPCIONES_GENERO, OPCIONES_SUENO
+
+VERSION = 1
+VERSION_SIN_MODELO = 2
+PREFIJO = "~"
+
+_EPOCA = datetime(1970, 1, 1)
+_LITERAL = 255
+_SIN_VERSION = 255
+
+_SI_NO = ["Yes", "No"]
+CAMPOS_CATEGORICOS = [
+    ("gender", OPCIONES_GENERO),
+    ("family_history", _SI_NO),
+    ("suicidal_thoughts", _SI_NO),
+    ("sleep_duration", OPCIONES_SUENO),
+    ("dietary_habits", OPCIONES_DIETA),
+    ("works", _SI_NO),
+]
+CAMPOS_DECIMALES = [
+    "academic_pressure",
+    "cgpa",
+    "study_hours",
+    "study_satisfaction",
+    "financial_stress",
+    "work_pressure",
+]
+
+# Mismo orden de claves que construir_registro (app.py)
+ORDEN_CAMPOS = [
+    "timestamp",
+    "age",
+    "gender",
+    "academic_pressure",
+    "cgpa",
+    "study_hours",
+    "study_satisfaction",
+    "financial_stress",
+    "family_history",
+    "suicidal_thoughts",
+    "sleep_duration",
+    "dietary_habits",
+    "works",
+    "work_pressure",
+    "prediction",
+    "probability",
+    "message",
+    "model_version",
+]
+# Registros guardados por api_predict antes de model_version
+ORDEN_CAMPOS_SIN_MODELO = ORDEN_CAMPOS[:-1]
+
+_FIJO = struct.Struct("<Bqi6B6dBd")
+
+
+def mensaje_riesgo(prediccion: int, probabilidad: float) -> str:
+    if prediccion == 1:
+        return f"Alto riesgo de depresión (Probabilidad: {probabilidad:.2f})"
+    return f"Bajo riesgo de depresión (Probabilidad: {probabilidad:.2f})"
+
+
+def _corto(texto):
+    datos = texto.encode("utf-8")
+    if len(datos) >= 255:
+        raise ValueError("Texto demasiado largo para el formato compacto")
+    return bytes([len(datos)]) + datos
+
+
+def codificar(registro):
+    """
+    Registro -> texto compacto. Lanza ValueError si el registro no se puede
+    representar sin perder información.
+    """
+    campos = list(registro)
+    if campos == ORDEN_CAMPOS:
+        version = VERSION
+    elif campos == ORDEN_CAMPOS_SIN_MODELO:
+        version = VERSION_SIN_MODELO
+    else:
+        raise ValueError("Campos distintos a los de construir_registro")
+
+    fecha = datetime.fromisoformat(registro["timestamp"])
+    if fecha.tzinfo is not None or fecha.isoformat() != registro["timestamp"]:
+        raise ValueError("timestamp no es un isoformat UTC sin zona")
+    micros = (fecha - _EPOCA) // timedelta(microseconds=1)
+
+    age, prediccion = registro["age"], registro["prediction"]
+    probabilidad = registro["probability"]
+    if type(age) is not int or prediccion not in (0, 1) or type(prediccion) is not int:
+        raise ValueError("age/prediction no son enteros")
+    if type(probabilidad) is not float:
+        raise ValueError("probability no es decimal")
+    if registro["message"] != mensaje_riesgo(prediccion, probabilidad):
+        raise ValueError("message no es el derivado de prediction/probability")
+
+    codigos, literales = [], b""
+    for campo, opciones in CAMPOS_CATEGORICOS:
+        valor = registro[campo]
+        if valor in opciones:
+            codigos.append(opciones.index(valor))
+        elif isinstance(valor, str):
+            codigos.append(_LITERAL)
+            literales += _corto(valor)
+        else:
+            raise ValueError(f"{campo} no es texto")
+
+    decimales = [registro[campo] for campo in CAMPOS_DECIMALES]
+    if any(type(v) is not float for v in decimales):
+        raise ValueError("Campos decimales con otro tipo")
+
+    version_modelo = registro.get("model_version")
+    if version == VERSION_SIN_MODELO:
+        version_modelo = b""
+    elif version_modelo is None:
+        version_modelo = bytes([_SIN_VERSION])
+    elif isinstance(version_modelo, str) and version_modelo.isascii():
+        version_modelo = _corto(version_modelo)
+    else:
+        raise ValueError("model_version no es ASCII")
+
+    try:
+        fijo = _FIJO.pack(version, micros, age, *codigos, *decimales, prediccion, probabilidad)
+    except struct.error as e:
+        raise ValueError(str(e))
+
+    return PREFIJO + base64.b64encode(fijo + version_modelo + literales).decode("ascii")
+
+
+def _leer_corto(datos, pos):
+    largo = datos[pos]
+    return datos[pos + 1:pos + 1 + largo].decode("utf-8"), pos + 1 + largo
+
+
+def _decodificar_compacto(texto):
+    datos = base64.b64decode(texto[len(PREFIJO):])
+    if datos[0] not in (VERSION, VERSION_SIN_MODELO):
+        raise ValueError(f"Versión de registro desconocida: {datos[0]}")
+
+    (version, micros, age, c_gen, c_fam, c_sui, c_sue, c_die, c_tra,
+     pressure, cgpa, hours, satisfaction, stress, work_pressure,
+     prediccion, probabilidad) = _FIJO.unpack_from(datos)
+
+    pos = _FIJO.size
+    if version == VERSION_SIN_MODELO:
+        version_modelo = None
+    elif datos[pos] == _SIN_VERSION:
+        version_modelo, pos = None, pos + 1
+    else:
+        version_modelo, pos = _leer_corto(datos, pos)
+
+    categoricos = []
+    codigos = (c_gen, c_fam, c_sui, c_sue, c_die, c_tra)
+    for (_, opciones), codigo in zip(CAMPOS_CATEGORICOS, codigos):
+        if codigo == _LITERAL:
+            valor, pos = _leer_corto(datos, pos)
+        else:
+            valor = opciones[codigo]
+        categoricos.append(valor)
+    genero, familia, suicidio, sueno, dieta, trabaja = categoricos
+
+    registro = {
+        "timestamp": (_EPOCA + timedelta(microseconds=micros)).isoformat(),
+        "age": age,
+        "gender": genero,
+        "academic_pressure": pressure,
+        "cgpa": cgpa,
+        "study_hours": hours,
+        "study_satisfaction": satisfaction,
+        "financial_stress": stress,
+        "family_history": familia,
+        "suicidal_thoughts": suicidio,
+        "sleep_duration": sueno,
+        "dietary_habits": dieta,
+        "works": trabaja,
+        "work_pressure": work_pressure,
+        "prediction": prediccion,
+        "probability": probabilidad,
+        "message": mensaje_riesgo(prediccion, probabilidad),
+    }
+    if version == VERSION:
+        registro["model_version"] = version_modelo
+    return registro
+
+
+def serializar(registro):
+    """
+    Formato compacto si el registro lo permite; si no, JSON.
+    """
+    try:
+        return codificar(registro)
+    except (ValueError, KeyError, TypeError):
+        return json.dumps(registro)
+
+
+def decodificar(texto):
+    """
+    Texto guardado en "predictions" (compacto o JSON) -> registro.
+    """
+    if texto.startswith(PREFIJO):
+        return _decodificar_compacto(texto)
+    return json.loads(texto)
+
+
+# ---------- Migración y mediciones ----------
+
+def migrar(r, clave="predictions", lote=1000):
+    """
+    Reescribe en formato compacto los registros JSON de la lista. Solo se
+    agregan registros al final de la lista, así que los índices existentes
+    no cambian y se puede migrar con la app en marcha. Devuelve cuántos se
+    convirtieron.
+    """
+    convertidos = 0
+    inicio = 0
+    while True:
+        items = r.lrange(clave, inicio, inicio + lote - 1)
+        if not items:
+            return convertidos
+        pipe = r.pipeline(transaction=False)
+        for i, texto in enumerate(items, start=inicio):
+            if texto.startswith(PREFIJO):
+                continue
+            try:
+                compacto = codificar(json.loads(texto))
+            except (ValueError, KeyError, TypeError):
+                continue
+            pipe.lset(clave, i, compacto)
+            convertidos += 1
+        pipe.execute()
+        inicio += len(items)
+
+
+def medir(r, clave="predictions", lote=1000):
+    """
+    Bytes por registro (texto y, si Redis lo permite, MEMORY USAGE de la
+    lista) y µs para decodificar cada registro en un recorrido completo.
+    """
+    total = r.llen(clave)
+    bytes_texto = 0
+    segundos = 0.0
+    for inicio in range(0, total, lote):
+        items = r.lrange(clave, inicio, inicio + lote - 1)
+        bytes_texto += sum(len(t.encode("utf-8")) for t in items)
+        t0 = time.perf_counter()
+        for texto in items:
+            decodificar(texto)
+        segundos += time.perf_counter() - t0
+
+    try:
+        memoria = r.memory_usage(clave, samples=0)
+    except Exception:
+        memoria = None
+
+    return {
+        "registros": total,
+        "bytes_por_registro": bytes_texto / total if total else 0.0,
+        "memoria_redis_por_registro": memoria / total if memoria and total else None,
+        "us_decodificar_por_registro": segundos / total * 1e6 if total else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    import redis
+
+    if sys.argv[1:] not in (["medir"], ["migrar"]):
+        print("Uso: python registros.py medir|migrar")
+        sys.exit(2)
+
+    cliente = redis.Redis(
+        host=os.environ.get("REDIS_HOST", "redis"),
+        port=int(os.environ.get("REDIS_PORT", "6379")),
+        decode_responses=True,
+    )
+    print("Antes:", json.dumps(medir(cliente)))
+    if sys.argv[1] == "migrar":
+        print(f"Registros convertidos: {migrar(cliente)}")
+        print("Después:", json.dumps(medir(cliente)))
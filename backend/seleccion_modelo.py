@@ -0,0 +1,223 @@
+"""
+Selección de hiperparámetros con validación cruzada en paralelo.
+
+Evalúa una malla de C, penalización, solver y class_weight con k-fold
+estratificado sobre la parte de entrenamiento (la de prueba queda intacta
+para el reporte final). Cada tarea (configuración, fold) corre en un pool de
+procesos. La matriz dispersa se copia una sola vez a memoria compartida y
+cada worker la lee desde ahí, en lugar de recibirla serializada por tarea.
+
+Al final se reentrena la mejor configuración con entrenamiento.entrenar y
+se escribe junto al artefacto:
+  <ruta>.json            reporte del modelo final
+  <ruta>.seleccion.json  mejor configuración, métricas y tiempos por fold
+
+Uso desde la terminal:
+    python seleccion_modelo.py --salida proyecto_curso.pkl --folds 5 --procesos 16
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from threadpoolctl import threadpool_limits
+
+import entrenamiento
+
+logger = logging.getLogger(__name__)
+
+MALLA = {
+    "C": [0.01, 0.1, 1.0, 10.0],
+    "penalty": ["l2", "l1"],
+    "solver": ["lbfgs", "liblinear", "saga"],
+    "class_weight": [None, "balanced"],
+}
+
+# Combinaciones que scikit-learn no soporta
+_INCOMPATIBLES = {("l1", "lbfgs")}
+
+
+def configuraciones(malla=MALLA):
+    claves = list(malla)
+    for valores in itertools.product(*(malla[c] for c in claves)):
+        config = dict(zip(claves, valores))
+        if (config["penalty"], config["solver"]) not in _INCOMPATIBLES:
+            yield config
+
+
+# ----- memoria compartida -----
+
+def _compartir(arreglo, segmentos):
+    """
+    Copia un arreglo a un segmento de memoria compartida y devuelve su
+    descriptor (nombre, forma, dtype), que es lo único que viaja a los workers.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(arreglo.nbytes, 1))
+    np.ndarray(arreglo.shape, dtype=arreglo.dtype, buffer=shm.buf)[:] = arreglo
+    segmentos.append(shm)
+    return shm.name, arreglo.shape, arreglo.dtype.str
+
+
+def _adjuntar(descriptor, segmentos):
+    nombre, forma, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=nombre)
+    segmentos.append(shm)
+    return np.ndarray(forma, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+# Estado de cada worker (se llena una vez en el initializer)
+_WORKER = {}
+
+
+def _iniciar_worker(descriptores, forma, folds, semilla):
+    # Un hilo BLAS por proceso: el paralelismo lo da el pool
+    _WORKER["limites"] = threadpool_limits(1)
+    segmentos = []
+    data, indices, indptr, y = (_adjuntar(d, segmentos) for d in descriptores)
+    _WORKER["segmentos"] = segmentos
+    _WORKER["X"] = sparse.csr_matrix((data, indices, indptr), shape=forma, copy=False)
+    _WORKER["y"] = y
+    # Los folds se recalculan igual en cada worker (misma semilla)
+    _WORKER["folds"] = list(
+        StratifiedKFold(folds, shuffle=True, random_state=semilla).split(
+            np.zeros(len(y)), y
+        )
+    )
+
+
+def _evaluar_fold(tarea):
+    indice_config, config, fold, max_iter = tarea
+    X, y = _WORKER["X"], _WORKER["y"]
+    entrenar_idx, validar_idx = _WORKER["folds"][fold]
+
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+    model = entrenamiento.crear_modelo(max_iter=max_iter, **config)
+    model.fit(X[entrenar_idx], y[entrenar_idx])
+    segundos = time.perf_counter() - inicio
+    segundos_cpu = time.process_time() - inicio_cpu
+
+    probabilidades = model.predict_proba(X[validar_idx])[:, 1]
+    predicciones = (probabilidades > 0.5).astype(int)
+    return {
+        "config": indice_config,
+        "fold": fold,
+        "segundos": segundos,
+        "segundos_cpu": segundos_cpu,
+        "roc_auc": float(roc_auc_score(y[validar_idx], probabilidades)),
+        "accuracy": float(accuracy_score(y[validar_idx], predicciones)),
+        "f1": float(f1_score(y[validar_idx], predicciones)),
+    }
+
+
+def buscar(X, y, malla=MALLA, folds=5, procesos=None, max_iter=200,
+           metrica="roc_auc", semilla=42):
+    """
+    Validación cruzada de todas las configuraciones. Devuelve el resumen
+    ordenado de mejor a peor según `metrica`.
+    """
+    X = sparse.csr_matrix(X)
+    configs = list(configuraciones(malla))
+    tareas = [
+        (i, config, fold, max_iter)
+        for i, config in enumerate(configs)
+        for fold in range(folds)
+    ]
+    procesos = procesos or os.cpu_count() or 1
+    logger.info("%d configuraciones x %d folds = %d ajustes en %d procesos",
+                len(configs), folds, len(tareas), procesos)
+
+    segmentos = []
+    try:
+        descriptores = [
+            _compartir(arreglo, segmentos)
+            for arreglo in (X.data, X.indices, X.indptr, np.asarray(y))
+        ]
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            initializer=_iniciar_worker,
+            initargs=(descriptores, X.shape, folds, semilla),
+        ) as pool:
+            resultados = list(pool.map(_evaluar_fold, tareas, chunksize=1))
+        segundos_pared = time.perf_counter() - inicio
+    finally:
+        for shm in segmentos:
+            shm.close()
+            shm.unlink()
+
+    resumen = []
+    for i, config in enumerate(configs):
+        por_fold = sorted((r for r in resultados if r["config"] == i), key=lambda r: r["fold"])
+        valores = np.array([r[metrica] for r in por_fold])
+        resumen.append({
+            "config": config,
+            f"{metrica}_media": float(valores.mean()),
+            f"{metrica}_desv": float(valores.std()),
+            "segundos_folds": float(sum(r["segundos"] for r in por_fold)),
+            "segundos_cpu": float(sum(r["segundos_cpu"] for r in por_fold)),
+            "folds": [{k: v for k, v in r.items() if k != "config"} for r in por_fold],
+        })
+    resumen.sort(key=lambda c: c[f"{metrica}_media"], reverse=True)
+
+    # segundos_folds suma el tiempo de pared de cada ajuste; dividido entre
+    # el tiempo de pared total da cuántos folds corrieron a la vez en promedio.
+    # segundos_cpu es el tiempo de CPU de los workers (time.process_time).
+    segundos_folds = sum(r["segundos"] for r in resultados)
+    segundos_cpu = sum(r["segundos_cpu"] for r in resultados)
+    logger.info("Búsqueda terminada en %.1f s de pared; los folds suman %.1f s "
+                "(%.1f s de CPU), %.1f folds en paralelo en promedio",
+                segundos_pared, segundos_folds, segundos_cpu, segundos_folds / segundos_pared)
+    return {
+        "metrica": metrica,
+        "folds": folds,
+        "procesos": procesos,
+        "segundos_pared": segundos_pared,
+        "segundos_folds": segundos_folds,
+        "segundos_cpu": segundos_cpu,
+        "mejor": resumen[0]["config"],
+        "configuraciones": resumen,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con k-fold.")
+    parser.add_argument("--csv", default=entrenamiento.CSV_PATH)
+    parser.add_argument("--salida", default="proyecto_curso.pkl")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--procesos", type=int, default=None)
+    parser.add_argument("--max-iter", type=int, default=200)
+    parser.add_argument("--metrica", default="roc_auc", choices=["roc_auc", "accuracy", "f1"])
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    data = entrenamiento.leer_dataset(args.csv)
+    X, _ = entrenamiento.codificar_disperso(data)
+    y = data[entrenamiento.OBJETIVO].to_numpy()
+    X_train, _, y_train, _ = entrenamiento.dividir(X, y)
+
+    seleccion = buscar(X_train, y_train, folds=args.folds, procesos=args.procesos,
+                       max_iter=args.max_iter, metrica=args.metrica)
+
+    model, reporte = entrenamiento.entrenar(
+        args.csv, max_iter=args.max_iter, **seleccion["mejor"]
+    )
+    entrenamiento.guardar(model, reporte, args.salida)
+    with open(f"{args.salida}.seleccion.json", "w", encoding="utf-8") as f:
+        json.dump(seleccion, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps({"mejor": seleccion["mejor"], **reporte["metricas_prueba"]},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
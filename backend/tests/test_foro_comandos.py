@@ -0,0 +1,109 @@
+"""
+Cada escritura del foro debe ser una sola ida a Redis (ver foro.py).
+
+Se importa app.py contra fakeredis y se cuentan las idas: cada comando
+directo del cliente (incluido EVALSHA) y cada pipeline/MULTI enviado.
+"""
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # fakeredis necesita lupa para los scripts Lua
+
+import redis
+from redis.client import Pipeline
+
+
+@pytest.fixture(scope="module")
+def app_foro(tmp_path_factory):
+    """
+    app.py importado contra fakeredis. Al terminar el módulo se detiene el
+    vigilante del registro, se restaura el entorno y se saca `app` de
+    sys.modules para que otras pruebas no hereden este cliente.
+    """
+    servidor = fakeredis.FakeServer()
+
+    def redis_falso(*args, **kwargs):
+        kwargs.pop("host", None)
+        kwargs.pop("port", None)
+        return fakeredis.FakeRedis(server=servidor, **kwargs)
+
+    with pytest.MonkeyPatch.context() as entorno:
+        entorno.setenv("MODELOS_DIR", str(tmp_path_factory.mktemp("modelos")))
+        entorno.delenv("FORO_LIKES_DIFERIDOS_MS", raising=False)
+        entorno.delitem(sys.modules, "app", raising=False)
+        with pytest.MonkeyPatch.context() as parche:
+            # Solo durante el import: las pruebas usan la clase real de redis-py
+            parche.setattr(redis, "Redis", redis_falso)
+            import app
+        try:
+            yield app
+        finally:
+            app.registro_modelos.detener()
+            sys.modules.pop("app", None)
+
+
+@pytest.fixture
+def idas(monkeypatch):
+    """
+    Lista con una entrada por ida a Redis: el nombre del comando directo o
+    "PIPELINE[...]" con los comandos del pipeline.
+    """
+    registro = []
+    execute_command = redis.Redis.execute_command
+    execute = Pipeline.execute
+
+    def contar_comando(self, *args, **kwargs):
+        registro.append(args[0])
+        return execute_command(self, *args, **kwargs)
+
+    def contar_pipeline(self, *args, **kwargs):
+        comandos = ",".join(str(c[0][0]) for c in self.command_stack)
+        registro.append(f"PIPELINE[{comandos}]")
+        return execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(redis.Redis, "execute_command", contar_comando)
+    monkeypatch.setattr(Pipeline, "execute", contar_pipeline)
+    return registro
+
+
+@pytest.fixture
+def cliente(app_foro):
+    return app_foro.app.test_client()
+
+
+@pytest.fixture
+def post_id(cliente):
+    resp = cliente.post("/api/foro/publicaciones", json={"contenido": "hola"})
+    return resp.get_json()["id"]
+
+
+def test_crear_publicacion_una_ida(cliente, idas):
+    resp = cliente.post("/api/foro/publicaciones", json={"contenido": "hola"})
+    assert resp.status_code == 201
+    assert len(idas) == 1, idas
+    assert idas[0].startswith("PIPELINE[")
+
+
+def test_crear_respuesta_una_ida(cliente, post_id, idas):
+    resp = cliente.post(f"/api/foro/publicaciones/{post_id}/respuestas", json={"contenido": "r"})
+    assert resp.status_code == 201
+    assert idas == ["EVALSHA"]
+
+
+def test_agregar_reaccion_una_ida(cliente, post_id, idas):
+    resp = cliente.post(f"/api/foro/publicaciones/{post_id}/reaccion", json={"tipo": "like"})
+    assert resp.status_code == 200
+    assert resp.get_json()["likes"] == 1
+    assert idas == ["EVALSHA"]
+
+
+@pytest.mark.parametrize("ruta, cuerpo", [
+    ("respuestas", {"contenido": "r"}),
+    ("reaccion", {"tipo": "like"}),
+])
+def test_publicacion_inexistente_una_ida(cliente, idas, ruta, cuerpo):
+    resp = cliente.post(f"/api/foro/publicaciones/no-existe/{ruta}", json=cuerpo)
+    assert resp.status_code == 404
+    assert idas == ["EVALSHA"]
@@ -0,0 +1,83 @@
+"""
+Paginación del feed por cursor: recorrido completo sin repetir ni saltar y
+sin leer enteros los empates de score (todas las publicaciones con 0 likes
+comparten score 0 en el índice popular).
+"""
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+import foro
+
+PUBLICACIONES = 250
+CON_LIKES = 20
+
+
+@pytest.fixture
+def r():
+    cliente = fakeredis.FakeRedis(decode_responses=True)
+    foro.cargar_scripts(cliente)
+    for i in range(PUBLICACIONES):
+        foro.crear_publicacion(cliente, f"p{i:03d}", f"contenido {i}", 1_700_000_000_000 + i)
+    for i in range(CON_LIKES):
+        for _ in range(i % 3 + 1):
+            foro.sumar_like(cliente, f"p{i:03d}")
+    return cliente
+
+
+@pytest.fixture
+def leidos(r, monkeypatch):
+    """
+    Entradas del índice que devuelve cada llamada al script de página.
+    """
+    registro = []
+    script = foro._scripts["pagina"]
+
+    def contar(*args, **kwargs):
+        resultado = script(*args, **kwargs)
+        registro.append((len(resultado) - 1) // 2)
+        return resultado
+
+    monkeypatch.setitem(foro._scripts, "pagina", contar)
+    return registro
+
+
+def recorrer(r, indice, limite):
+    ids, cursor = [], None
+    while True:
+        publicaciones, cursor, total = foro.pagina(r, indice, cursor, limite)
+        ids.extend(p["id"] for p in publicaciones)
+        assert total == PUBLICACIONES
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("indice", list(foro.INDICES.values()))
+def test_recorrido_completo_en_orden(r, indice):
+    ids = recorrer(r, indice, 20)
+    esperado = [post_id for post_id, _ in r.zrevrange(indice, 0, -1, withscores=True)]
+    assert ids == esperado
+
+
+def test_empates_en_cero_no_se_leen_enteros(r, leidos):
+    ceros = r.zcount(foro.POPULARES_KEY, 0, 0)
+    assert ceros == PUBLICACIONES - CON_LIKES
+
+    ids = recorrer(r, foro.POPULARES_KEY, 20)
+    assert len(ids) == len(set(ids)) == PUBLICACIONES
+    # Cada página pide a lo sumo limite + 1 entradas, aunque haya 230 empates
+    assert leidos and max(leidos) <= 21
+
+
+def test_cursor_de_publicacion_que_cambio_de_score(r):
+    publicaciones, cursor, _ = foro.pagina(r, foro.POPULARES_KEY, None, 5)
+    score, ultimo = foro.parsear_cursor(cursor)
+    foro.sumar_like(r, ultimo)
+
+    siguientes, _, _ = foro.pagina(r, foro.POPULARES_KEY, cursor, 5)
+    vistos = {p["id"] for p in publicaciones}
+    assert not vistos & {p["id"] for p in siguientes}
+    assert all(
+        r.zscore(foro.POPULARES_KEY, p["id"]) < score for p in siguientes
+    )
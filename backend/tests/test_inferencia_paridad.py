@@ -0,0 +1,119 @@
+"""
+Paridad de MotorLogistico contra predict/predict_proba de scikit-learn sobre
+el dataset de entrenamiento, por las tres rutas que usa la API: el lote denso
+(predecir_lote) y la ruta dispersa (predecir_activos / explicar_activos).
+"""
+import os
+import warnings
+
+import numpy as np
+import pytest
+
+joblib = pytest.importorskip("joblib")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from inferencia import CodificadorEstudiante, MotorLogistico
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELO = os.path.join(BACKEND, "proyecto_curso.pkl")
+DATASET = os.path.join(BACKEND, "StudentDepressionDataset.csv")
+
+TOLERANCIA = 1e-12
+
+
+@pytest.fixture(scope="module")
+def modelo():
+    if not os.path.exists(MODELO):
+        pytest.skip("Falta proyecto_curso.pkl")
+    return joblib.load(MODELO)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    if not os.path.exists(DATASET):
+        pytest.skip("Falta StudentDepressionDataset.csv")
+    return pd.read_csv(DATASET).dropna()
+
+
+@pytest.fixture(scope="module")
+def X(modelo, dataset):
+    # Mismas columnas que en el entrenamiento (proyecto_curso.py)
+    data = pd.get_dummies(dataset, drop_first=True)
+    return data.reindex(columns=modelo.feature_names_in_, fill_value=0).to_numpy(dtype=np.float64)
+
+
+def sklearn_predecir(modelo, X):
+    """
+    (predict, predict_proba[:, 1]) de scikit-learn. El modelo se entrenó con
+    un DataFrame y aquí recibe arreglos NumPy en el mismo orden de columnas.
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        return modelo.predict(X), modelo.predict_proba(X)[:, 1]
+
+
+@pytest.fixture(scope="module")
+def motor(modelo):
+    return MotorLogistico.desde_modelo(modelo)
+
+
+def test_predecir_lote(modelo, motor, X):
+    esperadas, probabilidades_sklearn = sklearn_predecir(modelo, X)
+    etiquetas, probabilidades = motor.predecir_lote(X)
+    np.testing.assert_array_equal(etiquetas, esperadas)
+    np.testing.assert_allclose(probabilidades, probabilidades_sklearn, rtol=0, atol=TOLERANCIA)
+
+
+def test_predecir_y_explicar_activos(modelo, motor, X):
+    esperadas, probabilidades = sklearn_predecir(modelo, X)
+
+    for i, fila in enumerate(X):
+        indices = np.flatnonzero(fila)
+        valores = fila[indices]
+
+        etiqueta, probabilidad = motor.predecir_activos(indices, valores)
+        assert etiqueta == esperadas[i]
+        assert probabilidad == pytest.approx(probabilidades[i], rel=0, abs=TOLERANCIA)
+
+        etiqueta, probabilidad, _ = motor.explicar_activos(indices, valores)
+        assert etiqueta == esperadas[i]
+        assert probabilidad == pytest.approx(probabilidades[i], rel=0, abs=TOLERANCIA)
+
+
+def test_activos_desde_formulario(modelo, motor, dataset):
+    """
+    Filas armadas como las del formulario: CodificadorEstudiante.activos
+    debe dar la misma predicción que scikit-learn sobre la fila densa.
+    """
+    codificador = CodificadorEstudiante(modelo.feature_names_in_)
+    lista_valores = [
+        {
+            "age": int(fila["Age"]),
+            "gender": fila["Gender"],
+            "academic_pressure": float(fila["Academic Pressure"]),
+            "cgpa": float(fila["CGPA"]),
+            "study_hours": float(fila["Work/Study Hours"]),
+            "study_satisfaction": float(fila["Study Satisfaction"]),
+            "financial_stress": float(fila["Financial Stress"]),
+            "family_history": fila["Family History of Mental Illness"],
+            "suicidal_thoughts": fila["Have you ever had suicidal thoughts ?"],
+            "sleep_duration": fila["Sleep Duration"],
+            "dietary_habits": fila["Dietary Habits"],
+            "works": "No",
+            "work_pressure": float(fila["Work Pressure"]),
+        }
+        for _, fila in dataset.head(2000).iterrows()
+    ]
+    matriz = codificador.codificar_lote(lista_valores)
+    esperadas, probabilidades = sklearn_predecir(modelo, matriz)
+
+    for i, valores in enumerate(lista_valores):
+        indices, datos = codificador.activos(valores)
+        etiqueta, probabilidad = motor.predecir_activos(indices, datos)
+        assert etiqueta == esperadas[i]
+        assert probabilidad == pytest.approx(probabilidades[i], rel=0, abs=TOLERANCIA)
+
+        etiqueta, probabilidad, _ = motor.explicar_activos(indices, datos)
+        assert etiqueta == esperadas[i]
+        assert probabilidad == pytest.approx(probabilidades[i], rel=0, abs=TOLERANCIA)
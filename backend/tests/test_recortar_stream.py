@@ -0,0 +1,66 @@
+"""
+recortar_stream conserva las max_log entradas más nuevas y nunca borra
+entradas pendientes o sin entregar al grupo de agregadores.
+"""
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+import estadisticas
+
+STREAM = estadisticas.METRICAS_STREAM
+GRUPO = estadisticas.GRUPO_AGREGADORES
+
+
+@pytest.fixture
+def r():
+    cliente = fakeredis.FakeRedis(decode_responses=True)
+    # MINID exacto para que el resultado no dependa de los nodos internos
+    xtrim = cliente.xtrim
+    cliente.xtrim = lambda *args, **kwargs: xtrim(*args, **{**kwargs, "approximate": False})
+    estadisticas.crear_grupos(cliente)
+    for i in range(20):
+        estadisticas.guardar_evento_metrica(cliente, {"i": i})
+    return cliente
+
+
+def primero(r):
+    return json.loads(r.xrange(STREAM, count=1)[0][1]["r"])["i"]
+
+
+def leer(r, n=None):
+    return r.xreadgroup(GRUPO, "c", {STREAM: ">"}, count=n)[0][1]
+
+
+def test_sin_leer_no_se_borra_nada(r):
+    assert estadisticas.recortar_stream(r, STREAM, 5) == 0
+    assert r.xlen(STREAM) == 20
+
+
+def test_no_pasa_de_la_pendiente_mas_antigua(r):
+    entradas = leer(r, 12)
+    r.xack(STREAM, GRUPO, *[i for i, _ in entradas[:4] + entradas[6:]])
+    estadisticas.recortar_stream(r, STREAM, 5)
+    assert primero(r) == 4
+
+
+def test_no_pasa_de_la_primera_sin_entregar(r):
+    r.xack(STREAM, GRUPO, *[i for i, _ in leer(r, 12)])
+    estadisticas.recortar_stream(r, STREAM, 5)
+    assert primero(r) == 12
+
+
+def test_conserva_las_max_log_mas_nuevas(r):
+    r.xack(STREAM, GRUPO, *[i for i, _ in leer(r)])
+    assert estadisticas.recortar_stream(r, STREAM, 5) == 15
+    assert r.xlen(STREAM) == 5
+    assert primero(r) == 15
+    assert estadisticas.recortar_stream(r, STREAM, 5) == 0
+
+
+def test_sin_limite(r):
+    r.xack(STREAM, GRUPO, *[i for i, _ in leer(r)])
+    assert estadisticas.recortar_stream(r, STREAM, None) == 0
+    assert r.xlen(STREAM) == 20
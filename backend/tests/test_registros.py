@@ -0,0 +1,82 @@
+"""
+Formato compacto de registros: ida y vuelta exacta y migración de la
+lista "predictions" escrita por versiones anteriores.
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+import registros
+
+
+def registro_base(**cambios):
+    """
+    Registro con la forma que guardaba api_predict antes de model_version.
+    """
+    probabilidad = cambios.pop("probability", 0.7312345678)
+    prediccion = cambios.pop("prediction", 1)
+    registro = {
+        "timestamp": datetime(2025, 3, 4, 5, 6, 7, 891011).isoformat(),
+        "age": 21,
+        "gender": "Female",
+        "academic_pressure": 4.0,
+        "cgpa": 7.85,
+        "study_hours": 6.0,
+        "study_satisfaction": 2.0,
+        "financial_stress": 3.0,
+        "family_history": "Yes",
+        "suicidal_thoughts": "No",
+        "sleep_duration": "Less than 5 hours",
+        "dietary_habits": "Unhealthy",
+        "works": "No",
+        "work_pressure": 0.0,
+        "prediction": prediccion,
+        "probability": probabilidad,
+        "message": registros.mensaje_riesgo(prediccion, probabilidad),
+    }
+    registro.update(cambios)
+    return registro
+
+
+def assert_identicos(a, b):
+    assert list(a.items()) == list(b.items())
+
+
+@pytest.mark.parametrize("registro", [
+    registro_base(),
+    registro_base(gender="No binario", prediction=0, probability=0.12),
+    {**registro_base(), "model_version": "485447b0de93"},
+    {**registro_base(), "model_version": None},
+])
+def test_ida_y_vuelta_exacta(registro):
+    texto = registros.codificar(registro)
+    assert texto.startswith(registros.PREFIJO)
+    assert_identicos(registros.decodificar(texto), registro)
+
+
+def test_registro_sin_model_version_usa_version_2():
+    texto = registros.codificar(registro_base())
+    decodificado = registros.decodificar(texto)
+    assert "model_version" not in decodificado
+
+
+def test_migrar_registros_de_la_version_base():
+    fakeredis = pytest.importorskip("fakeredis")
+    r = fakeredis.FakeRedis(decode_responses=True)
+
+    originales = [
+        json.dumps(registro_base()),
+        json.dumps(registro_base(age=30, prediction=0, probability=0.25, works="Yes",
+                                 work_pressure=3.0)),
+        json.dumps(registro_base(sleep_duration="5-6 hours")),
+        json.dumps({"texto": "no es un registro"}),
+    ]
+    r.rpush("predictions", *originales)
+
+    assert registros.migrar(r) == 3
+
+    guardados = r.lrange("predictions", 0, -1)
+    assert [t.startswith(registros.PREFIJO) for t in guardados] == [True, True, True, False]
+    for original, guardado in zip(originales, guardados):
+        assert_identicos(registros.decodificar(guardado), json.loads(original))
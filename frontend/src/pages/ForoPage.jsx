@@ -12,8 +12,12 @@ function ForoPage() {
   const [mostrarRespuestas, setMostrarRespuestas] = useState({});
   const [nuevaRespuesta, setNuevaRespuesta] = useState({});
   const [enviandoRespuesta, setEnviandoRespuesta] = useState({});
+  const [cursorRespuestas, setCursorRespuestas] = useState({});
 
   const [ordenamiento, setOrdenamiento] = useState("recientes");
+  const [totalPublicaciones, setTotalPublicaciones] = useState(0);
+  const [siguienteCursor, setSiguienteCursor] = useState(null);
+  const [cargandoMas, setCargandoMas] = useState(false);
 
   // Usar variable de entorno como en tus otros componentes
   const API_URL = import.meta.env.VITE_API_URL || "http://localhost:5000";
@@ -38,6 +42,8 @@ function ForoPage() {
 
       const data = await resp.json();
       setPublicaciones(data.publicaciones || []);
+      setTotalPublicaciones(data.total || 0);
+      setSiguienteCursor(data.siguiente_cursor || null);
     } catch (err) {
       console.error("Error al cargar publicaciones:", err);
       setError(err.message);
@@ -46,6 +52,36 @@ function ForoPage() {
     }
   };
 
+  const cargarMasPublicaciones = async () => {
+    if (!siguienteCursor) {
+      return;
+    }
+
+    setCargandoMas(true);
+    setError("");
+
+    try {
+      const resp = await fetch(
+        `${API_URL}/api/foro/publicaciones?orden=${ordenamiento}&cursor=${encodeURIComponent(siguienteCursor)}`
+      );
+
+      if (!resp.ok) {
+        const errorText = await resp.text();
+        throw new Error(`Error ${resp.status}: ${errorText}`);
+      }
+
+      const data = await resp.json();
+      setPublicaciones(prev => [...prev, ...(data.publicaciones || [])]);
+      setTotalPublicaciones(data.total || 0);
+      setSiguienteCursor(data.siguiente_cursor || null);
+    } catch (err) {
+      console.error("Error al cargar más publicaciones:", err);
+      setError(err.message);
+    } finally {
+      setCargandoMas(false);
+    }
+  };
+
   const handleCrearPublicacion = async () => {
     if (!nuevaPublicacion.trim()) {
       return;
@@ -81,10 +117,11 @@ function ForoPage() {
     }
   };
 
-  const cargarRespuestas = async (postId) => {
+  const cargarRespuestas = async (postId, cursor = null) => {
     try {
       const resp = await fetch(
-        `${API_URL}/api/foro/publicaciones/${postId}/respuestas`
+        `${API_URL}/api/foro/publicaciones/${postId}/respuestas` +
+          (cursor ? `?cursor=${encodeURIComponent(cursor)}` : "")
       );
       
       if (!resp.ok) {
@@ -94,7 +131,13 @@ function ForoPage() {
       const data = await resp.json();
       setRespuestas(prev => ({
         ...prev,
-        [postId]: data.respuestas || []
+        [postId]: cursor
+          ? [...(prev[postId] || []), ...(data.respuestas || [])]
+          : data.respuestas || []
+      }));
+      setCursorRespuestas(prev => ({
+        ...prev,
+        [postId]: data.siguiente_cursor || null
       }));
     } catch (err) {
       console.error("Error cargando respuestas:", err);
@@ -314,7 +357,7 @@ function ForoPage() {
         {/* Controles de ordenamiento */}
         <div className="flex items-center justify-between">
           <p className="text-sm font-medium text-slate-700">
-            {publicaciones.length} {publicaciones.length === 1 ? "publicación" : "publicaciones"}
+            {totalPublicaciones} {totalPublicaciones === 1 ? "publicación" : "publicaciones"}
           </p>
           <div className="flex gap-2">
             <button
@@ -337,6 +380,16 @@ function ForoPage() {
             >
               Populares
             </button>
+            <button
+              onClick={() => setOrdenamiento("tendencia")}
+              className={`px-3 py-1.5 rounded-lg text-xs font-medium transition-colors ${
+                ordenamiento === "tendencia"
+                  ? "bg-blue-600 text-white"
+                  : "bg-slate-100 text-slate-700 hover:bg-slate-200"
+              }`}
+            >
+              Tendencia
+            </button>
           </div>
         </div>
 
@@ -492,6 +545,15 @@ function ForoPage() {
                             </div>
                           </div>
                         ))}
+
+                        {cursorRespuestas[post.id] && (
+                          <button
+                            onClick={() => cargarRespuestas(post.id, cursorRespuestas[post.id])}
+                            className="text-xs font-medium text-blue-600 hover:text-blue-700"
+                          >
+                            Ver más respuestas
+                          </button>
+                        )}
                       </div>
                     )}
 
@@ -505,6 +567,19 @@ function ForoPage() {
               </div>
             ))
           )}
+
+          {siguienteCursor && (
+            <div className="flex justify-center">
+              <button
+                onClick={cargarMasPublicaciones}
+                disabled={cargandoMas}
+                className="px-4 py-2 rounded-xl text-sm font-medium text-slate-700 bg-slate-100 
+                         hover:bg-slate-200 disabled:opacity-50 transition-colors"
+              >
+                {cargandoMas ? "Cargando..." : "Cargar más"}
+              </button>
+            </div>
+          )}
         </div>
       </section>
     </div>